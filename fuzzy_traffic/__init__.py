@@ -0,0 +1,30 @@
+"""
+Fuzzy controlled traffic light.
+
+Importing the package does no work: the universes and membership functions
+are sampled on first use (see default_system), skfuzzy is imported by the
+functions that need it and matplotlib only by fuzzy_traffic.plotting.
+The cold import time target is 0.2 s, of which numpy takes about 0.1 s;
+measure it with:
+
+    python -X importtime -c "import fuzzy_traffic"
+
+The demo with the diagnostic figures is run with python -m fuzzy_traffic.
+"""
+from .analytic import analytic_extension, analytic_urgency
+from .batch import batch_decisions, batch_extension, batch_urgency
+from .cache import CachedController, LRUCache
+from .comparison import compare_methods
+from .config import ReloadableSystem, load_config, save_config
+from .inference import (FuzzySystem, aggregate, decision, default_system,
+                        defuzzify, extension, generate_memberships,
+                        interpret_memberships, rule_activation, urgency)
+from .lookup_tables import (compile_lookup_tables, load_lookup_tables,
+                            lookup_decisions)
+from .metrics import Recorder
+from .precision import check_output_error, output_error
+from .replay import convert_log, load_log, replay_log
+from .scheduler import DecisionScheduler, ScheduledDecision, fixed_time_plan
+from .simulation import run_simulation
+from .sparse import sparse_extension, sparse_urgency
+from .streaming import Decision, Event, StreamingController
@@ -0,0 +1,162 @@
+import numpy as np
+
+from . import definitions
+from .inference import clamp_input
+from .rules import default_rule_bases
+
+def trapezoid(params):
+    """
+    Returns the breakpoints of a trimf [a, b, c] or trapmf [a, b, c, d]
+    membership function as a trapezoid (a, b, c, d)
+    """
+    if len(params) == 3:
+        return params[0], params[1], params[1], params[2]
+    return tuple(params)
+
+def _clipped(trap, x, height):
+    """
+    Membership value of x in the trapezoid (a, b, c, d) clipped at height
+    """
+    a, b, c, d = trap
+    if x < a or x > d:
+        return 0.0
+    # A vertical edge (a == b or c == d) is a step instead of a slope
+    if x < b:
+        return min((x - a) / (b - a), height)
+    if x > c:
+        return min((d - x) / (d - c), height)
+    return float(height)
+
+def trapezoid_membership(params, x, height=1.0):
+    """
+    Calculates the membership value of the crisp x in the trimf/trapmf defined
+    by its breakpoints, clipped at height
+    """
+    return _clipped(trapezoid(params), x, height)
+
+def analytic_memberships(bounds, dict_params, fuzzy_element):
+    """
+    Same as interpret_memberships, but the membership values are calculated
+    from the breakpoints in dict_params instead of sampled arrays.
+    Elements outside of the universe bounds are members of no set.
+    """
+    inside = bounds[0] <= fuzzy_element <= bounds[1]
+    return {label: trapezoid_membership(params, fuzzy_element)
+            if inside else 0.0
+            for label, params in dict_params.items()}
+
+def analytic_rule_strengths(rule_base, *antecedents):
+    """
+    Firing strength of each consequent fuzzy set of the compiled rule_base for
+    crisp antecedent membership values. Evaluated with plain floats, numpy
+    only adds overhead for a single decision.
+    """
+    strengths = {}
+    for row in rule_base.rows:
+        rule = min(antec[label] for antec, label in zip(antecedents, row))
+        if rule > strengths.get(row[-1], 0.0):
+            strengths[row[-1]] = rule
+    return strengths
+
+def analytic_centroid(bounds, dict_params, strengths):
+    """
+    Centroid of the union of the consequent fuzzy sets in dict_params clipped
+    at their firing strengths. The union is piecewise linear, so it is
+    integrated exactly between its breakpoints: the corners of the clipped
+    trapezoids and the points where two of them cross.
+    """
+    active = [(trapezoid(dict_params[label]), height)
+              for label, height in strengths.items() if height > 0]
+    lower, upper = bounds
+    points = {lower, upper}
+    for (a, b, c, d), height in active:
+        for x in (a, a + height * (b - a), d - height * (d - c), d):
+            points.add(min(max(x, lower), upper))
+    points = sorted(points)
+
+    sum_moment_area = 0.0
+    sum_area = 0.0
+    for x0, x1 in zip(points[:-1], points[1:]):
+        # Every clipped set is linear between two neighbouring points, the
+        # values at the ends are extrapolated from two inner points, so that
+        # vertical edges get the value of the correct side
+        t1, t2 = x0 + (x1 - x0) / 3, x0 + 2 * (x1 - x0) / 3
+        lines = []
+        for trap, height in active:
+            y_t1, y_t2 = _clipped(trap, t1, height), _clipped(trap, t2, height)
+            lines.append((2 * y_t1 - y_t2, 2 * y_t2 - y_t1))
+        # Split the interval where two of the clipped sets cross
+        cuts = [0.0, 1.0]
+        for k in range(len(lines)):
+            for l in range(k + 1, len(lines)):
+                diff0 = lines[k][0] - lines[l][0]
+                diff1 = lines[k][1] - lines[l][1]
+                if diff0 * diff1 < 0:
+                    cuts.append(diff0 / (diff0 - diff1))
+        cuts.sort()
+        # The union (max) is linear between two cuts
+        heights = [max([0.0] + [y0 + (y1 - y0) * t for y0, y1 in lines])
+                   for t in cuts]
+        for t0, t1, y0, y1 in zip(cuts[:-1], cuts[1:], heights[:-1],
+                                  heights[1:]):
+            u0 = x0 + t0 * (x1 - x0)
+            dx = (t1 - t0) * (x1 - x0)
+            area = 0.5 * dx * (y0 + y1)
+            sum_moment_area += u0 * area + dx * dx * (y0 / 6.0 + y1 / 3.0)
+            sum_area += area
+
+    return sum_moment_area / max(sum_area, np.finfo(float).eps)
+
+def universe_bounds(spec):
+    """
+    First and last sample of the universe np.arange(*spec), computed without
+    sampling it
+    """
+    start, stop, step = spec
+    # np.arange has ceil((stop - start) / step) samples, start + i * step
+    return start, start + (int(np.ceil((stop - start) / step)) - 1) * step
+
+def _definitions(system):
+    """
+    Universe specs, membership function breakpoints and compiled rule bases
+    of system, or of the default definitions if it is None. No universe or
+    membership function is sampled.
+    """
+    if system is None:
+        return (definitions.universe_specs, definitions.membership_params,
+                default_rule_bases())
+    return system.universe_specs, system.membership_params, system.rules
+
+def analytic_urgency(q_cars, w, system=None):
+    """
+    Calculates the defuzzified urgency of a direction from the sum of its
+    waiting cars and their waiting time (both clamped to their universes)
+    without sampling the universes
+    """
+    specs, params, rules = _definitions(system)
+    bounds = universe_bounds(specs['sum_queue'])
+    sum_queue = analytic_memberships(bounds, params['sum_queue'],
+                                     clamp_input(bounds, q_cars))
+    bounds = universe_bounds(specs['waiting_time'])
+    wait_t = analytic_memberships(bounds, params['waiting_time'],
+                                  clamp_input(bounds, w))
+    strengths = analytic_rule_strengths(rules['urgency'], sum_queue, wait_t)
+    return analytic_centroid(universe_bounds(specs['urgency']),
+                             params['urgency'], strengths)
+
+def analytic_extension(inner, outer, system=None):
+    """
+    Calculates the defuzzified green phase extension time from the inner and
+    outer lane queues (clamped to their universe) without sampling the
+    universes
+    """
+    specs, params, rules = _definitions(system)
+    bounds = universe_bounds(specs['lane_queue'])
+    inner_queue = analytic_memberships(bounds, params['inner_lane_queue'],
+                                       clamp_input(bounds, inner))
+    outer_queue = analytic_memberships(bounds, params['outer_lane_queue'],
+                                       clamp_input(bounds, outer))
+    strengths = analytic_rule_strengths(rules['extension'], inner_queue,
+                                        outer_queue)
+    return analytic_centroid(universe_bounds(specs['extension_time']),
+                             params['extension_time'], strengths)
@@ -0,0 +1,224 @@
+"""
+Benchmark of every inference stage and of end-to-end decisions at several
+universe resolutions. Reports latency percentiles and the peak memory
+allocated by one call, and saves the results as JSON so that runs on
+different commits can be compared:
+
+    python -m fuzzy_traffic.benchmark --output before.json
+    python -m fuzzy_traffic.benchmark --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from . import definitions
+from .analytic import analytic_extension, analytic_urgency
+from .batch import batch_decisions
+from .inference import (FuzzySystem, aggregate, decision, defuzzify,
+                        extension, interpret_memberships, rule_activation,
+                        urgency)
+from .lookup_tables import (compile_lookup_tables, load_lookup_tables,
+                            lookup_decisions)
+from .sparse import sparse_extension, sparse_urgency
+
+def measure(func, inputs, repeat):
+    """
+    Calls func(*inputs[i % len(inputs)]) repeat times. Returns the latency
+    percentiles in microseconds and the peak memory of a single call.
+    """
+    func(*inputs[0])
+    tracemalloc.start()
+    func(*inputs[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        args = inputs[i % len(inputs)]
+        start = time.perf_counter_ns()
+        func(*args)
+        timings[i] = time.perf_counter_ns() - start
+    timings /= 1000.0
+    return {
+        'repeat': repeat,
+        'mean_us': float(timings.mean()),
+        'p50_us': float(np.percentile(timings, 50)),
+        'p90_us': float(np.percentile(timings, 90)),
+        'p99_us': float(np.percentile(timings, 99)),
+        'max_us': float(timings.max()),
+        'peak_bytes': int(peak),
+    }
+
+def resolution_system(step):
+    """
+    FuzzySystem with every universe sampled at step
+    """
+    specs = {name: (start, stop, step)
+             for name, (start, stop, _) in definitions.universe_specs.items()}
+    return FuzzySystem(universe_specs=specs)
+
+def stage_benchmarks(system, tables, seed=0):
+    """
+    Returns (name, func, inputs) of every benchmarked stage for system,
+    tables are the lookup tables of load_lookup_tables
+    """
+    rng = np.random.default_rng(seed)
+    n = 64
+    q_cars = rng.integers(0, 21, n)
+    w = rng.integers(0, 151, n)
+    inner = rng.integers(0, 11, n)
+    outer = rng.integers(0, 11, n)
+
+    sum_queues = [interpret_memberships(system.sum_queue_range,
+                                        system.sum_queue_mf, q) for q in q_cars]
+    wait_ts = [interpret_memberships(system.waiting_time_range,
+                                     system.waiting_time_mf, t) for t in w]
+    inner_queues = [interpret_memberships(system.lane_queue_range,
+                                          system.inner_lane_queue_mf, q)
+                    for q in inner]
+    outer_queues = [interpret_memberships(system.lane_queue_range,
+                                          system.outer_lane_queue_mf, q)
+                    for q in outer]
+    activated = [rule_activation(s, t, system.urgency_mf, 'urgency',
+                                 system.rules)
+                 for s, t in zip(sum_queues, wait_ts)]
+    aggregated = [(aggregate(a),) for a in activated]
+    lane_queues = [
+        {direction: {'inner': int(i), 'outer': int(o)}
+         for direction, i, o in zip(definitions.directions,
+                                    np.roll(inner, k)[:4],
+                                    np.roll(outer, k)[:4])}
+        for k in range(n)]
+    waiting_times = [dict(zip(definitions.directions, np.roll(w, k)[:4]))
+                     for k in range(n)]
+    batch = (rng.integers(0, 11, (1000, 4)), rng.integers(0, 11, (1000, 4)),
+             rng.integers(0, 151, (1000, 4)))
+
+    return [
+        ('interpret_memberships',
+         lambda q: interpret_memberships(system.sum_queue_range,
+                                         system.sum_queue_mf, q),
+         [(q,) for q in q_cars]),
+        ('rule_activation_urgency',
+         lambda s, t: rule_activation(s, t, system.urgency_mf, 'urgency',
+                                      system.rules),
+         list(zip(sum_queues, wait_ts))),
+        ('rule_activation_extension',
+         lambda i, o: rule_activation(i, o, system.extension_time_mf,
+                                      'extension', system.rules),
+         list(zip(inner_queues, outer_queues))),
+        ('aggregate', aggregate, [(a,) for a in activated]),
+        ('defuzzify_centroid',
+         lambda a: defuzzify(system.urgency_range, a), aggregated),
+        ('urgency', lambda q, t: urgency(q, t, system), list(zip(q_cars, w))),
+        ('extension', lambda i, o: extension(i, o, system),
+         list(zip(inner, outer))),
+        ('decision', lambda l, t: decision(l, t, system),
+         list(zip(lane_queues, waiting_times))),
+        ('sparse_urgency', lambda q, t: sparse_urgency(q, t, system),
+         list(zip(q_cars, w))),
+        ('sparse_extension', lambda i, o: sparse_extension(i, o, system),
+         list(zip(inner, outer))),
+        ('analytic_urgency', lambda q, t: analytic_urgency(q, t, system),
+         list(zip(q_cars, w))),
+        ('analytic_extension', lambda i, o: analytic_extension(i, o, system),
+         list(zip(inner, outer))),
+        ('batch_decisions_1000',
+         lambda i, o, t: batch_decisions(i, o, t, system=system), [batch]),
+        ('lookup_decisions_1000',
+         lambda i, o, t: lookup_decisions(tables, i, o, t), [batch]),
+    ]
+
+def run_benchmarks(resolutions=(0.1, 0.01), repeat=200, batch_repeat=5):
+    """
+    Runs every stage benchmark at every universe resolution, returns the
+    results with some information about the environment
+    """
+    results = []
+    for step in resolutions:
+        system = resolution_system(step)
+        with tempfile.TemporaryDirectory() as directory:
+            # Coarse tables, the lookup cost does not depend on their size
+            compile_lookup_tables(directory, queue_step=1.0, waiting_step=5.0,
+                                  lane_step=1.0, system=system,
+                                  check_samples=None)
+            tables = load_lookup_tables(directory)
+            for name, func, inputs in stage_benchmarks(system, tables):
+                n = batch_repeat if name.startswith('batch') else repeat
+                result = {'name': name, 'resolution': step}
+                result.update(measure(func, inputs, n))
+                results.append(result)
+            del tables
+    try:
+        # The commit of this checkout, wherever the benchmark is run from
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))
+                                ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'meta': {
+            'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+
+def compare(results, baseline):
+    """
+    Prints the change of the median latency of every benchmark in results
+    relative to baseline
+    """
+    old = {(r['name'], r['resolution']): r for r in baseline['results']}
+    for r in results['results']:
+        key = (r['name'], r['resolution'])
+        if key in old:
+            ratio = r['p50_us'] / old[key]['p50_us']
+            print(f"{r['name']:<28} {r['resolution']:<8} "
+                  f"{old[key]['p50_us']:>12.1f} -> {r['p50_us']:>12.1f} us "
+                  f"({ratio:.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic.benchmark',
+        description='Benchmark of the fuzzy inference stages')
+    parser.add_argument('--resolutions', type=float, nargs='+',
+                        default=[0.1, 0.01],
+                        help='universe steps (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='calls per single decision benchmark '
+                             '(default: %(default)s)')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON file of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.resolutions, args.repeat)
+    print(f"{'benchmark':<28} {'step':<8} {'p50':>10} {'p90':>10} "
+          f"{'p99':>10} {'peak KiB':>10}")
+    for r in results['results']:
+        print(f"{r['name']:<28} {r['resolution']:<8} {r['p50_us']:>10.1f} "
+              f"{r['p90_us']:>10.1f} {r['p99_us']:>10.1f} "
+              f"{r['peak_bytes'] / 1024:>10.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(f"\nMedian latency compared to {args.compare}:")
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Memoization of fuzzification and of the crisp outputs. Sensors report whole
+car counts and seconds, so the same inputs keep coming back across
+directions, intersections and cycles.
+"""
+import collections
+import sys
+
+from .definitions import directions
+from .inference import (aggregate, clamp_input, default_system, defuzzify,
+                        interpret_memberships, rule_activation)
+
+def _size(value):
+    """
+    Approximate memory footprint of a cached key or value in bytes
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v)
+                    for k, v in value.items())
+    elif isinstance(value, tuple):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+class LRUCache:
+    """
+    Bounded mapping evicting the least recently used entries once it holds
+    more than max_entries entries or more than max_bytes bytes (None means no
+    limit). Counts hits, misses and evictions.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        """
+        Returns the cached value of key, or computes, stores and returns
+        compute() if it is missing
+        """
+        try:
+            value, _ = self.entries[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+        value = compute()
+        size = _size(key) + _size(value)
+        self.entries[key] = (value, size)
+        self.nbytes += size
+        while self.entries and (
+                (self.max_entries is not None
+                 and len(self.entries) > self.max_entries)
+                or (self.max_bytes is not None
+                    and self.nbytes > self.max_bytes)):
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        """
+        Drops every entry, the counters are kept
+        """
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        """
+        Counters for sizing the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+class CachedController:
+    """
+    Scalar engine with a cache in front of fuzzification and one in front of
+    the crisp urgency and extension outputs. The inputs are rounded to
+    multiples of quantum first and evaluated at the rounded value, so every
+    cached result equals the exact result at the rounded input.
+    """
+
+    def __init__(self, system=None, quantum=0.01, max_entries=4096,
+                 max_bytes=None):
+        self.system = system or default_system()
+        self.quantum = quantum
+        self.fuzzify_cache = LRUCache(max_entries, max_bytes)
+        self.output_cache = LRUCache(max_entries, max_bytes)
+
+    def quantize(self, crisp):
+        """
+        Rounds the crisp input to the nearest multiple of quantum
+        """
+        return round(round(crisp / self.quantum) * self.quantum, 10)
+
+    def memberships(self, name, crisp):
+        """
+        Cached interpret_memberships of the membership function set name
+        (e.g. 'sum_queue') at the quantized crisp input
+        """
+        crisp = self.quantize(crisp)
+        universe = getattr(self.system, f"{name}_range", None)
+        if universe is None:
+            # Both lane queues are defined on the same universe
+            universe = self.system.lane_queue_range
+        return self.fuzzify_cache.get(
+            (name, crisp),
+            lambda: interpret_memberships(
+                universe, getattr(self.system, f"{name}_mf"), crisp))
+
+    def urgency(self, q_cars, w):
+        """
+        Cached crisp urgency, see inference.urgency
+        """
+        q_cars = self.quantize(clamp_input(self.system.sum_queue_range,
+                                           q_cars))
+        w = self.quantize(clamp_input(self.system.waiting_time_range, w))
+
+        def compute():
+            active = rule_activation(
+                self.memberships('sum_queue', q_cars),
+                self.memberships('waiting_time', w), self.system.urgency_mf,
+                'urgency', self.system.rules)
+            return float(defuzzify(self.system.urgency_range,
+                                   aggregate(active)))
+
+        return self.output_cache.get(('urgency', q_cars, w), compute)
+
+    def extension(self, inner, outer):
+        """
+        Cached crisp green phase extension, see inference.extension
+        """
+        lanes = self.system.lane_queue_range
+        inner = self.quantize(clamp_input(lanes, inner))
+        outer = self.quantize(clamp_input(lanes, outer))
+
+        def compute():
+            active = rule_activation(
+                self.memberships('inner_lane_queue', inner),
+                self.memberships('outer_lane_queue', outer),
+                self.system.extension_time_mf, 'extension', self.system.rules)
+            return float(defuzzify(self.system.extension_time_range,
+                                   aggregate(active)))
+
+        return self.output_cache.get(('extension', inner, outer), compute)
+
+    def decision(self, lane_queues, waiting_times):
+        """
+        Same as inference.decision, with the cached engine
+        """
+        urgencies = {direction: self.urgency(
+                         sum(lane_queues[direction].values()),
+                         waiting_times[direction])
+                     for direction in directions}
+        # The first direction wins a tie
+        winner = max(urgencies, key=urgencies.get)
+        return urgencies, winner, self.extension(lane_queues[winner]['inner'],
+                                                 lane_queues[winner]['outer'])
+
+    def stats(self):
+        """
+        Counters of both caches
+        """
+        return {'fuzzification': self.fuzzify_cache.stats(),
+                'output': self.output_cache.stats()}
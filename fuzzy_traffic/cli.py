@@ -0,0 +1,197 @@
+"""
+Command line demo of the controller: evaluates one intersection, prints the
+fuzzy membership values (in Hungarian) and draws the diagnostic figures.
+
+    python -m fuzzy_traffic [--no-plots | --save-plots DIRECTORY]
+                            [--compile-lut DIRECTORY]
+                            [--simulate INTERSECTIONS [--duration SECONDS]
+                             [--processes N]]
+"""
+import argparse
+import os
+
+from .definitions import directions
+from .inference import (aggregate, default_system, defuzzify,
+                        interpret_memberships, rule_activation)
+
+# TEST VARS
+# Waiting cars in specficic lanes in each directions
+n_lane_queues = {
+    'inner': 0,
+    'outer': 9,
+}
+e_lane_queues = {
+    'inner': 9,
+    'outer': 4,
+}
+s_lane_queues = {
+    'inner': 3,
+    'outer': 2,
+}
+w_lane_queues = {
+    'inner': 7,
+    'outer': 2,
+}
+lane_queues = {
+    'north': n_lane_queues,
+    'east': e_lane_queues,
+    'south': s_lane_queues,
+    'west': w_lane_queues,
+}
+# Waiting time since the last green phase in each direction
+waiting_times = {
+    'north': 30,
+    'east': 60,
+    'south': 0,
+    'west': 120,
+}
+
+def run_demo(plots=True, save_dir=None):
+    """
+    Evaluates the test intersection and prints the results, the figures are
+    only drawn if plots is set. If save_dir is given, they are saved there
+    with the non-interactive Agg backend instead of being shown.
+    """
+    system = default_system()
+    figures = {}
+    if plots:
+        if save_dir:
+            import matplotlib
+            matplotlib.use('Agg')
+        from . import plotting
+        figures['memberships'] = plotting.plot_memberships(system)
+
+    # Calculate the fuzzy memberships of queue and waiting time for each
+    # direction
+    sums_print, ws_print, urgencies = [], [], []
+    for direction in directions:
+        q_cars = sum(lane_queues[direction].values())
+        sum_queue = interpret_memberships(system.sum_queue_range,
+                                          system.sum_queue_mf, q_cars)
+        wait_t = interpret_memberships(system.waiting_time_range,
+                                       system.waiting_time_mf,
+                                       waiting_times[direction])
+        # Traffic urgency fuzzy membership values
+        urgencies.append(rule_activation(sum_queue, wait_t, system.urgency_mf,
+                                         'urgency'))
+        sums_print.append(sum_queue)
+        ws_print.append(wait_t)
+
+    # Aggregate all four urgency output membership functions together and
+    # defuzzify the aggregated outputs
+    aggregated_urgencies, defuzz_results = {}, {}
+    for urgency, key in zip(urgencies, directions):
+        aggregated_urgencies[key] = aggregate(urgency)
+        defuzz_results[key] = defuzzify(system.urgency_range,
+                                        aggregated_urgencies[key])
+
+    if plots:
+        figures['urgencies'] = plotting.plot_urgencies(system, urgencies)
+        figures['defuzzified_urgencies'] = (
+            plotting.plot_defuzzified_urgencies(system, aggregated_urgencies,
+                                                defuzz_results))
+
+    # Need to also receive an index to print directions in Hungarian
+    max_index = max(range(len(directions)),
+                    key=lambda i: defuzz_results[directions[i]])
+    max_key = directions[max_index]
+
+    # Print urgency calculation results
+    directions_print = ["Észak", "Kelet", "Dél", "Nyugat"]
+    print("\nAz egyes irányok fuzzy tagsági értékei:")
+    for (direction_print, sum_print, w_print, urgency_print, dir) in zip(
+            directions_print, sums_print, ws_print, urgencies, directions):
+        print("-----------------------------------------------")
+        print(f"    {direction_print}:")
+        print("    várakozó autók összmennyisége alapján")
+        for key, value in sum_print.items():
+            print(f"        {key} = {value}")
+        print("    várakozási idő alapján")
+        for key, value in w_print.items():
+            print(f"        {key} = {value}")
+        print(f"\n    ez alapján a prioritás fuzzy tagsági értéi:")
+        for key, value in urgency_print.items():
+            print(f"        {key} = {max(value)}")
+        print(f"\n    az összesített következtetés defuzzifikált eredménye:")
+        print(f"        {defuzz_results[dir]}")
+    print(f"\n\nA következő irány kapja a zöld lámpát: "
+          f"{directions_print[max_index]}")
+
+    # Calculate fuzzy memberships of lane queues for the most urgent direction
+    inner_queue = interpret_memberships(system.lane_queue_range,
+                                        system.inner_lane_queue_mf,
+                                        lane_queues[max_key]['inner'])
+    outer_queue = interpret_memberships(system.lane_queue_range,
+                                        system.outer_lane_queue_mf,
+                                        lane_queues[max_key]['outer'])
+
+    # Green phase extension fuzzy membership values
+    extension = rule_activation(inner_queue, outer_queue,
+                                system.extension_time_mf, 'extension')
+    # The aggregated result will be the union of all output membership
+    # functions
+    aggregated_extension = aggregate(extension)
+    defuzz_ext_result = defuzzify(system.extension_time_range,
+                                  aggregated_extension)
+
+    if plots:
+        figures['extension'] = plotting.plot_extension(system, extension)
+        figures['defuzzified_extension'] = (
+            plotting.plot_defuzzified_extension(system, aggregated_extension,
+                                                defuzz_ext_result))
+
+    lanes_title_print = ["Belső sáv", "Külső sáv"]
+    lanes_print = [inner_queue, outer_queue]
+    print("\nA kiválasztott irány sávjainak fuzzy tagsági értékei:")
+    for (lane_title, lane) in zip(lanes_title_print, lanes_print):
+        print("-----------------------------------------------")
+        print(f"    {lane_title}:")
+        print("    várakozó autók mennyisége alapján")
+        for lane_mf in lane.items():
+            print(f"        {lane_mf[0]} = {lane_mf[1]}")
+    print(f"\nA kiválasztott irány zöld lámpa időtartamát "
+          f"{defuzz_ext_result} másodperccel kell meghosszabbítani.")
+
+    if plots and save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        for name, figure in figures.items():
+            figure.savefig(os.path.join(save_dir, f"{name}.png"))
+    elif plots:
+        plotting.show()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic',
+        description='Fuzzy controlled traffic light demo')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='only print the results, do not draw figures')
+    parser.add_argument('--save-plots', metavar='DIRECTORY',
+                        help='save the figures to DIRECTORY instead of '
+                             'showing them (works without a display)')
+    parser.add_argument('--compile-lut', metavar='DIRECTORY',
+                        help='compile the control surface lookup tables '
+                             'into DIRECTORY instead of running the demo')
+    parser.add_argument('--simulate', type=int, metavar='INTERSECTIONS',
+                        help='simulate INTERSECTIONS intersections instead '
+                             'of running the demo')
+    parser.add_argument('--duration', type=float, default=3600,
+                        help='simulated seconds (default: %(default)s)')
+    parser.add_argument('--processes', type=int,
+                        help='simulation worker processes '
+                             '(default: number of CPUs)')
+    args = parser.parse_args(argv)
+
+    if args.compile_lut:
+        from .lookup_tables import compile_lookup_tables
+        errors = compile_lookup_tables(args.compile_lut)
+        for name, error in errors.items():
+            print(f"{name}: max error at least {error:.6f}")
+        return
+    if args.simulate:
+        from .simulation import run_simulation
+        results = run_simulation(args.simulate, args.duration,
+                                 processes=args.processes)
+        for key, value in results.items():
+            print(f"{key}: {value}")
+        return
+    run_demo(plots=not args.no_plots, save_dir=args.save_plots)
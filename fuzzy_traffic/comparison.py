@@ -0,0 +1,112 @@
+"""
+Compares the alternative defuzzification methods of the batch engine (mean
+of maxima, weighted average of singletons) with the Mamdani centroid over the
+whole input grid of whole car counts and seconds:
+
+    python -m fuzzy_traffic.comparison [--urgency METHOD] [--extension METHOD]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from .batch import (batch_decisions, batch_extension, batch_urgency,
+                    defuzzification_methods)
+from .inference import default_system
+
+def rank_agreement(reference, values, chunk_size=256, tolerance=1e-9):
+    """
+    Fraction of the pairs of inputs that reference and values order the same
+    way (both ties, or both greater in the same direction). For the urgency
+    this is how often the winner of two directions stays the same.
+    """
+    reference, values = np.ravel(reference), np.ravel(values)
+    same = 0
+    for start in range(0, len(reference), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        d_ref = reference[chunk, np.newaxis] - reference
+        d_val = values[chunk, np.newaxis] - values
+        sign_ref = np.where(np.abs(d_ref) < tolerance, 0, np.sign(d_ref))
+        sign_val = np.where(np.abs(d_val) < tolerance, 0, np.sign(d_val))
+        same += int(np.count_nonzero(sign_ref == sign_val))
+    # The pairs of an input with itself always agree
+    n = len(reference)
+    return (same - n) / (n * n - n)
+
+def compare_methods(urgency_method='weighted_average',
+                    extension_method='weighted_average', samples=100000,
+                    seed=0, system=None):
+    """
+    Compares urgency_method and extension_method with the centroid:
+    urgency_rank_agreement  rank_agreement of the urgencies of every
+                            (0-20 cars, 0-150 seconds) pair of inputs
+    direction_agreement     fraction of the same chosen directions for
+                            samples random intersections of the grid (the
+                            full four direction grid is 3171^4 inputs)
+    extension_*_error       absolute difference of the extension times over
+                            every (0-10, 0-10) inner and outer lane queue
+    The throughput of batch_decisions with both configurations is reported
+    in decisions per second.
+    """
+    if system is None:
+        system = default_system()
+    cars, seconds = np.meshgrid(np.arange(21.0), np.arange(151.0),
+                                indexing='ij')
+    urgency_reference = batch_urgency(cars, seconds, system)
+    urgencies = batch_urgency(cars, seconds, system, urgency_method)
+
+    inner, outer = np.meshgrid(np.arange(11.0), np.arange(11.0),
+                               indexing='ij')
+    extension_error = np.abs(
+        batch_extension(inner, outer, system, extension_method)
+        - batch_extension(inner, outer, system))
+
+    rng = np.random.default_rng(seed)
+    inner_queues = rng.integers(0, 11, (samples, 4))
+    outer_queues = rng.integers(0, 11, (samples, 4))
+    waiting_times = rng.integers(0, 151, (samples, 4))
+    start = time.perf_counter()
+    _, reference_winners, reference_extensions = batch_decisions(
+        inner_queues, outer_queues, waiting_times, system=system)
+    reference_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, winners, extensions = batch_decisions(
+        inner_queues, outer_queues, waiting_times, system=system,
+        urgency_method=urgency_method, extension_method=extension_method)
+    seconds_taken = time.perf_counter() - start
+
+    return {
+        'urgency_method': urgency_method,
+        'extension_method': extension_method,
+        'urgency_rank_agreement': rank_agreement(urgency_reference, urgencies),
+        'urgency_max_difference': float(np.max(np.abs(
+            urgencies - urgency_reference))),
+        'direction_agreement': float(np.mean(winners == reference_winners)),
+        'decision_extension_max_error': float(np.max(np.abs(
+            extensions - reference_extensions))),
+        'extension_max_error': float(extension_error.max()),
+        'extension_mean_error': float(extension_error.mean()),
+        'centroid_decisions_per_second': samples / reference_seconds,
+        'decisions_per_second': samples / seconds_taken,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic.comparison',
+        description='Compare defuzzification methods with the centroid')
+    parser.add_argument('--urgency', choices=defuzzification_methods,
+                        default='weighted_average',
+                        help='urgency method (default: %(default)s)')
+    parser.add_argument('--extension', choices=defuzzification_methods,
+                        default='weighted_average',
+                        help='extension method (default: %(default)s)')
+    parser.add_argument('--samples', type=int, default=100000,
+                        help='random intersections for the chosen directions '
+                             '(default: %(default)s)')
+    args = parser.parse_args(argv)
+    results = compare_methods(args.urgency, args.extension, args.samples)
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Controller configuration files and hot reloading of a running controller.
+
+A configuration file is a JSON object with any of the sections
+universe_specs, membership_params and rule_bases (in the format of
+fuzzy_traffic.definitions) and dtype (see FuzzySystem). Everything missing,
+a whole section or single entries of one, is taken from the definitions,
+e.g. the output of python -m fuzzy_traffic.tuning only holds
+membership_params.
+
+A ReloadableSystem watches a configuration file. When the file changes, the
+new FuzzySystem is built next to the current one, only the changed universes,
+membership functions and rule bases are rebuilt, and then the reference is
+swapped in one assignment. A decision that already took the current system
+finishes with it, so every decision sees one consistent configuration.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import definitions
+from .inference import FuzzySystem, decision
+
+config_sections = ('universe_specs', 'membership_params', 'rule_bases')
+
+def load_config(path):
+    """
+    Reads a configuration file, the missing sections and entries are filled
+    in from the definitions
+    """
+    with open(path) as f:
+        config = json.load(f)
+    unknown = set(config) - set(config_sections) - {'dtype'}
+    if unknown:
+        raise ValueError(f"Unknown configuration sections: {sorted(unknown)}")
+    loaded = {section: {**getattr(definitions, section),
+                        **config.get(section, {})}
+              for section in config_sections}
+    loaded['universe_specs'] = {name: tuple(spec) for name, spec
+                                in loaded['universe_specs'].items()}
+    loaded['dtype'] = config.get('dtype', 'float64')
+    return loaded
+
+def save_config(path, system=None):
+    """
+    Writes the configuration of system (the definitions by default) to path,
+    a starting point for editing
+    """
+    if system is None:
+        config = {section: getattr(definitions, section)
+                  for section in config_sections}
+        config['dtype'] = 'float64'
+    else:
+        config = {section: getattr(system, section)
+                  for section in config_sections}
+        config['dtype'] = system.dtype.name
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+def build_system(config, previous=None):
+    """
+    FuzzySystem of a loaded configuration, sharing everything that did not
+    change with previous
+    """
+    return FuzzySystem(config['universe_specs'], config['membership_params'],
+                       config['rule_bases'], config['dtype'], previous)
+
+def check_rebuild(system, config):
+    """
+    Raises a ValueError if system, built incrementally from an older system,
+    does not give exactly the outputs of a fresh build of config for every
+    defuzzification method, over every whole (0-20 cars, 0-150 seconds)
+    urgency input and (0-10, 0-10) lane queue pair
+    """
+    from .batch import batch_extension, batch_urgency, defuzzification_methods
+
+    fresh = build_system(config)
+    cars, seconds = np.meshgrid(np.arange(21.0), np.arange(151.0),
+                                indexing='ij')
+    inner, outer = np.meshgrid(np.arange(11.0), np.arange(11.0),
+                               indexing='ij')
+    for method in defuzzification_methods:
+        if not np.array_equal(batch_urgency(cars, seconds, system, method),
+                              batch_urgency(cars, seconds, fresh, method)):
+            raise ValueError(f"Rebuilt urgency differs with {method}")
+        if not np.array_equal(batch_extension(inner, outer, system, method),
+                              batch_extension(inner, outer, fresh, method)):
+            raise ValueError(f"Rebuilt extension differs with {method}")
+
+class ReloadableSystem:
+    """
+    Holds the FuzzySystem of a configuration file and replaces it when the
+    file changes. listeners are called with every new system, e.g. to hand
+    it to a StreamingController. A configuration that cannot be loaded is
+    counted and kept in last_error, the current system stays in use.
+    With verify, every reloaded system is compared with a fresh build (see
+    check_rebuild) before it is swapped in, a difference counts as an error.
+    """
+
+    def __init__(self, path, listeners=(), verify=False):
+        self.path = path
+        self.listeners = list(listeners)
+        self.verify = verify
+        self.system = build_system(load_config(path))
+        self._stamp = self._file_stamp()
+        # Serializes the reloads, decisions never wait for it
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """
+        Loads the configuration file and swaps in its system, returns it
+        """
+        with self._lock:
+            start = time.perf_counter()
+            self._stamp = self._file_stamp()
+            try:
+                config = load_config(self.path)
+                system = build_system(config, self.system)
+                if self.verify:
+                    check_rebuild(system, config)
+            except Exception as error:
+                self.errors += 1
+                self.last_error = error
+                return self.system
+            # The swap is a single reference assignment
+            self.system = system
+            self.reloads += 1
+            self.last_reload_seconds = time.perf_counter() - start
+        for listener in self.listeners:
+            listener(system)
+        return system
+
+    def check(self):
+        """
+        Reloads the configuration if the file changed since it was last
+        loaded, returns whether it did
+        """
+        try:
+            changed = self._file_stamp() != self._stamp
+        except OSError:
+            # E.g. the file is being replaced, try again on the next check
+            return False
+        if changed:
+            self.reload()
+        return changed
+
+    def watch(self, interval=1.0):
+        """
+        Checks the file every interval seconds in a daemon thread until stop
+        is called, returns the thread
+        """
+        def run():
+            while not self._stop.wait(interval):
+                self.check()
+
+        self._stop.clear()
+        thread = threading.Thread(target=run, name='config-watch',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Stops the watch thread
+        """
+        self._stop.set()
+
+    def decision(self, lane_queues, waiting_times):
+        """
+        inference.decision with the current system
+        """
+        return decision(lane_queues, waiting_times, self.system)
+
+    def batch_decisions(self, inner_queues, outer_queues, waiting_times,
+                        **kwargs):
+        """
+        batch.batch_decisions with the current system
+        """
+        from .batch import batch_decisions
+
+        return batch_decisions(inner_queues, outer_queues, waiting_times,
+                               system=self.system, **kwargs)
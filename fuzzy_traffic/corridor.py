@@ -0,0 +1,215 @@
+"""
+Coordinated control of intersections linked into corridors or networks.
+
+A link leads the cars served on one approach (direction) of an upstream
+intersection to an approach of a downstream intersection, which they reach
+travel_time seconds later. through_fraction of them stay on the link, the
+rest turn off and leave the network. The cars on their way are kept per link
+and lane in a ring buffer of arrival seconds, so the platoons released by an
+upstream green phase are known before they arrive: the cars reaching an
+approach within the prediction horizon count as waiting there when the
+urgencies are compared (see the arrivals of batch_decisions), the extension
+only serves the cars already queued. Every second, all intersections whose
+green phase ends are decided together in one batch_decisions call.
+
+    python -m fuzzy_traffic.corridor [--intersections N] [--duration SECONDS]
+"""
+import argparse
+import collections
+import time
+
+import numpy as np
+
+from .batch import batch_decisions
+from .definitions import directions
+from .inference import default_system
+
+Link = collections.namedtuple(
+    'Link', ['upstream', 'direction', 'downstream', 'approach',
+             'travel_time'])
+
+def corridor_links(n_intersections, travel_time=30):
+    """
+    Links of a west–east corridor of n_intersections: the cars served on the
+    west approach of an intersection drive east to the west approach of the
+    next one, those served on the east approach drive west to the east
+    approach of the previous one
+    """
+    west, east = directions.index('west'), directions.index('east')
+    links = []
+    for i in range(n_intersections - 1):
+        links.append(Link(i, west, i + 1, west, travel_time))
+        links.append(Link(i + 1, east, i, east, travel_time))
+    return links
+
+class Network:
+    """
+    Intersections and the links between them (see Link, directions are
+    indices into definitions.directions) with the cars travelling on the
+    links
+    """
+
+    def __init__(self, n_intersections, links, through_fraction=0.7):
+        self.n_intersections = n_intersections
+        links = np.array(links, dtype=np.int64).reshape(-1, 5)
+        (self.upstream, self.direction, self.downstream, self.approach,
+         self.travel_time) = links.T
+        if np.any(self.travel_time < 1):
+            raise ValueError("Links need a travel time of at least 1 second")
+        self.through_fraction = through_fraction
+        self.slots = int(self.travel_time.max(initial=0)) + 1
+        # Cars (links × inner and outer lanes × arrival second modulo slots)
+        self.in_flight = np.zeros((len(links), 2, self.slots), dtype=np.int64)
+
+    def depart(self, served, t, rng):
+        """
+        Puts the cars served in second t, an array of shape
+        (n_intersections, 4, 2), on the links leaving their approaches
+        """
+        leaving = rng.binomial(served[self.upstream, self.direction],
+                               self.through_fraction)
+        slots = (t + self.travel_time) % self.slots
+        self.in_flight[np.arange(len(slots)), :, slots] += leaving
+
+    def arrive(self, t):
+        """
+        Takes the cars arriving in second t off the links, returns them as an
+        array of shape (n_intersections, 4, 2)
+        """
+        arrived = np.zeros((self.n_intersections, 4, 2), dtype=np.int64)
+        np.add.at(arrived, (self.downstream, self.approach),
+                  self.in_flight[:, :, t % self.slots])
+        self.in_flight[:, :, t % self.slots] = 0
+        return arrived
+
+    def predicted(self, t, horizon):
+        """
+        Cars arriving at each approach in the horizon seconds from second t
+        on, an array of shape (n_intersections, 4). The cars of second t are
+        included, they are only queued by arrive(t).
+        """
+        predicted = np.zeros((self.n_intersections, 4))
+        horizon = min(int(horizon), self.slots)
+        if horizon > 0:
+            window = (t + np.arange(horizon)) % self.slots
+            np.add.at(predicted, (self.downstream, self.approach),
+                      self.in_flight[:, :, window].sum(axis=(1, 2)))
+        return predicted
+
+def simulate_network(network, duration, arrival_rate=0.03, service_rate=0.5,
+                     green_time=10.0, horizon=None, seed=None, **kwargs):
+    """
+    Simulates the intersections of network like simulation.simulate_shard,
+    the approaches fed by links get the cars of the links on top of the
+    random arrivals. The controller is given the cars predicted within
+    horizon seconds (green_time by default, 0 decides every intersection in
+    isolation). kwargs are passed to batch_decisions.
+    Returns the traffic totals and the wall time of the decision steps.
+    """
+    if horizon is None:
+        horizon = green_time
+    system = default_system()
+    max_lane = system.lane_queue_range[-1]
+    max_wait = system.waiting_time_range[-1]
+
+    n = network.n_intersections
+    rng = np.random.default_rng(seed)
+    shape = (n, 4, 2)
+    arrival_rate = np.broadcast_to(arrival_rate, shape)
+    service_rate = np.broadcast_to(service_rate, shape)
+    queues = np.zeros(shape, dtype=np.int64)
+    waiting = np.zeros((n, 4))
+    green = np.zeros(n, dtype=np.intp)
+    phase_end = np.zeros(n)
+    rows = np.arange(n)
+    served = np.zeros(shape, dtype=np.int64)
+
+    delay = 0.0
+    departed = 0
+    max_queue = 0
+    decisions = 0
+    step_seconds = []
+    for t in range(int(duration)):
+        due = np.flatnonzero(phase_end <= t)
+        if len(due):
+            start = time.perf_counter()
+            # Queues and waiting times beyond the universes are clamped
+            clamped = np.minimum(queues[due], max_lane)
+            _, winners, extensions = batch_decisions(
+                clamped[:, :, 0], clamped[:, :, 1],
+                np.minimum(waiting[due], max_wait), system=system,
+                arrivals=network.predicted(t, horizon)[due], **kwargs)
+            step_seconds.append(time.perf_counter() - start)
+            green[due] = winners
+            phase_end[due] = t + green_time + extensions
+            decisions += len(due)
+
+        queues += rng.poisson(arrival_rate) + network.arrive(t)
+        served[:] = 0
+        served[rows, green] = np.minimum(
+            queues[rows, green], rng.poisson(service_rate[rows, green]))
+        queues -= served
+        network.depart(served, t, rng)
+        # A car crossing several intersections is served by each of them
+        departed += int(served.sum())
+
+        delay += float(queues.sum())
+        max_queue = max(max_queue, int(queues.sum(axis=2).max()))
+        waiting += 1.0
+        waiting[rows, green] = 0.0
+
+    return {
+        'intersections': n,
+        'delay': delay,
+        'departed': departed,
+        'waiting_cars': int(queues.sum()),
+        'max_queue': max_queue,
+        'decisions': decisions,
+        'max_step_seconds': max(step_seconds, default=0.0),
+        'mean_step_seconds': float(np.mean(step_seconds or [0.0])),
+    }
+
+def compare_coordination(n_intersections=200, duration=1800, travel_time=30,
+                         seed=0, **kwargs):
+    """
+    Simulates a corridor of n_intersections with the same traffic twice,
+    with the predicted arrivals and with every intersection in isolation.
+    kwargs are passed to simulate_network.
+    """
+    results = {}
+    for mode, horizon in (('coordinated', None), ('isolated', 0)):
+        network = Network(n_intersections,
+                          corridor_links(n_intersections, travel_time))
+        start = time.perf_counter()
+        shard = simulate_network(network, duration, horizon=horizon,
+                                 seed=seed, **kwargs)
+        results[mode] = {
+            'mean_delay': shard['delay'] / max(shard['departed'], 1),
+            'max_queue': shard['max_queue'],
+            'waiting_cars': shard['waiting_cars'],
+            'max_step_seconds': shard['max_step_seconds'],
+            'mean_step_seconds': shard['mean_step_seconds'],
+            'wall_seconds': time.perf_counter() - start,
+        }
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic.corridor',
+        description='Compare coordinated and isolated control of a corridor')
+    parser.add_argument('--intersections', type=int, default=200,
+                        help='(default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=1800,
+                        help='simulated seconds (default: %(default)s)')
+    parser.add_argument('--travel-time', type=int, default=30,
+                        help='seconds between neighbouring intersections '
+                             '(default: %(default)s)')
+    args = parser.parse_args(argv)
+    results = compare_coordination(args.intersections, args.duration,
+                                   args.travel_time)
+    for mode, values in results.items():
+        for key, value in values.items():
+            print(f"{mode} {key}: {value}")
+
+if __name__ == '__main__':
+    main()
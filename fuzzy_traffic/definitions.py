@@ -0,0 +1,146 @@
+"""
+Definitions of the fuzzy traffic light controller: universes, membership
+function breakpoints and rule bases. Only plain data lives here, the sampled
+arrays are built by FuzzySystem when they are first needed.
+"""
+
+# Directions of an intersection, the column order of every batched input
+directions = ['north', 'east', 'south', 'west']
+
+# Generate ranges for the membership functions, (start, stop, step) of the
+# np.arange sampling each universe
+universe_specs = {
+    # Sum of cars waiting in a given direction
+    'sum_queue': (0, 21, 0.01),
+    # Time elapsed since the last green phase in a given direction
+    'waiting_time': (0, 151, 0.01),
+    # Output for the inputs (sum_queue, waiting_time): the more cars wait in
+    # one direction, the more urgent they become.
+    'urgency': (0, 11, 0.01),
+    # Number of cars waiting in the inner lane (the lane that turns left) in a
+    # given direction OR in the outer lane (the lane that goes straight or
+    # turns right) in the same given direction
+    'lane_queue': (0, 11, 0.01),
+    # Output for the inputs (inner_lane_queue, outer_lane_queue):
+    'extension_time': (0, 41, 0.01),
+}
+
+# Breakpoints of the fuzzy membership functions, [a, b, c] defines a
+# triangular, [a, b, c, d] a trapezoidal membership function
+sum_queue_params = {
+    "zero": [0, 0, 0, 1],
+    "few": [0, 6, 12],
+    "medium": [6, 12, 18],
+    "many": [12, 18, 20, 21],
+}
+
+waiting_time_params = {
+    "negligible": [0, 0, 30, 60],
+    "short": [30, 60, 90],
+    "medium": [60, 90, 120],
+    "long": [90, 120, 150, 151],
+}
+
+urgency_params = {
+    "zero": [0, 0, 2, 4],
+    "low": [2, 4, 6],
+    "medium": [4, 6, 8],
+    "high": [6, 8, 10, 11],
+}
+
+inner_lane_queue_params = {
+    "negligible": [0, 0, 2, 4],
+    "few": [2, 4, 6],
+    "medium": [4, 6, 8],
+    "many": [6, 8, 10, 11],
+}
+
+# Might need to modify one single lane later, so keep the boilerplate code
+outer_lane_queue_params = {
+    "negligible": [0, 0, 2, 4],
+    "few": [2, 4, 6],
+    "medium": [4, 6, 8],
+    "many": [6, 8, 10, 11],
+}
+
+extension_time_params = {
+    "zero": [0, 0, 0, 1],
+    "short": [0, 10, 20],
+    "medium": [10, 20, 30],
+    "long": [20, 30, 40, 41],
+}
+
+# Membership function sets and the universe each of them is defined on
+membership_params = {
+    'sum_queue': sum_queue_params,
+    'waiting_time': waiting_time_params,
+    'urgency': urgency_params,
+    'inner_lane_queue': inner_lane_queue_params,
+    'outer_lane_queue': outer_lane_queue_params,
+    'extension_time': extension_time_params,
+}
+membership_universes = {
+    'sum_queue': 'sum_queue',
+    'waiting_time': 'waiting_time',
+    'urgency': 'urgency',
+    'inner_lane_queue': 'lane_queue',
+    'outer_lane_queue': 'lane_queue',
+    'extension_time': 'extension_time',
+}
+
+# Rule bases of the two inference stages. Each row of a rule table is a rule:
+# the labels of the antecedents (joined by AND) followed by the label of the
+# consequent, e.g. the first urgency rule is:
+# antecedent := (IF sum_of_waiting_cars = zero AND waiting_time = negligible)
+# consequent := (THEN urgency = zero)
+# Rules with the same consequent are joined by OR. The names refer to the
+# membership function sets of membership_params, rule_bases are compiled into
+# index arrays by fuzzy_traffic.rules.
+rule_bases = {
+    'urgency': {
+        # sum of waiting cars, waiting time since the last green phase
+        'antecedents': ['sum_queue', 'waiting_time'],
+        'consequent': 'urgency',
+        'rules': [
+            ['zero', 'negligible', 'zero'],
+            ['zero', 'short', 'low'],
+            ['zero', 'medium', 'medium'],
+            ['zero', 'long', 'high'],
+            ['few', 'negligible', 'zero'],
+            ['few', 'short', 'low'],
+            ['few', 'medium', 'medium'],
+            ['few', 'long', 'high'],
+            ['medium', 'negligible', 'low'],
+            ['medium', 'short', 'medium'],
+            ['medium', 'medium', 'medium'],
+            ['medium', 'long', 'high'],
+            ['many', 'negligible', 'medium'],
+            ['many', 'short', 'high'],
+            ['many', 'medium', 'high'],
+            ['many', 'long', 'high'],
+        ],
+    },
+    'extension': {
+        # cars waiting in the inner lane, cars waiting in the outer lane
+        'antecedents': ['inner_lane_queue', 'outer_lane_queue'],
+        'consequent': 'extension_time',
+        'rules': [
+            ['negligible', 'negligible', 'zero'],
+            ['negligible', 'few', 'short'],
+            ['negligible', 'medium', 'medium'],
+            ['negligible', 'many', 'long'],
+            ['few', 'negligible', 'short'],
+            ['few', 'few', 'short'],
+            ['few', 'medium', 'medium'],
+            ['few', 'many', 'long'],
+            ['medium', 'negligible', 'medium'],
+            ['medium', 'few', 'medium'],
+            ['medium', 'medium', 'medium'],
+            ['medium', 'many', 'long'],
+            ['many', 'negligible', 'long'],
+            ['many', 'few', 'long'],
+            ['many', 'medium', 'long'],
+            ['many', 'many', 'long'],
+        ],
+    },
+}
@@ -0,0 +1,264 @@
+import functools
+
+import numpy as np
+
+from . import definitions, metrics
+from .rules import RuleBase, default_rule_bases, rule_strengths
+
+# skfuzzy pulls in scipy and takes most of the import time, so it is only
+# imported by the functions that need it
+
+def generate_memberships(universe, dict_params):
+    """
+    Samples the triangular or trapezoidal membership functions defined by the
+    breakpoints in dict_params over the universe
+    """
+    import skfuzzy as fuzz
+
+    dict_mf = {}
+    for label, params in dict_params.items():
+        if len(params) == 3:
+            dict_mf[label] = fuzz.trimf(universe, params)
+        else:
+            dict_mf[label] = fuzz.trapmf(universe, params)
+    return dict_mf
+
+def membership_scale(dtype):
+    """
+    Value of full membership in arrays of dtype: 1 for floating point types,
+    the largest integer for the fixed-point integer types
+    """
+    if np.issubdtype(dtype, np.integer):
+        return np.iinfo(dtype).max
+    return 1.0
+
+def quantize_memberships(dict_mf, dtype):
+    """
+    Converts sampled membership functions to dtype, integer types hold
+    fixed-point values (membership × membership_scale(dtype), rounded)
+    """
+    if np.issubdtype(dtype, np.integer):
+        scale = membership_scale(dtype)
+        return {label: np.rint(mf * scale).astype(dtype)
+                for label, mf in dict_mf.items()}
+    return {label: mf.astype(dtype) for label, mf in dict_mf.items()}
+
+def clamp_input(universe, crisp):
+    """
+    Clamps crisp inputs to the ends of universe. An input beyond an end is a
+    member of the same sets as the end (e.g. longer queues than the universe
+    are as urgent as its last value) instead of being a member of none.
+    """
+    return np.clip(crisp, universe[0], universe[-1])
+
+@metrics.timed('fuzzification')
+def interpret_memberships(universe, dict_mf, fuzzy_element):
+    """
+    Calculates the fuzzy membership values of fuzzy_element for the
+    memberships defined in dict_mf
+    """
+    import skfuzzy as fuzz
+
+    calc_m = {}
+    for label, membership_func in dict_mf.items():
+        calc_m[label] = fuzz.interp_membership(
+            universe, membership_func, fuzzy_element
+        )
+    return calc_m
+
+@metrics.timed('rule_activation')
+def rule_activation(first_antec, second_antec, conseq_mf, case,
+                    rule_bases=None):
+    """
+    Evaluates the compiled rule base of case ('urgency' or 'extension') and
+    calculates the fuzzy membership values of each consequent fuzzy set
+    clipped at the firing strength of its rules
+    """
+    if rule_bases is None:
+        rule_bases = default_rule_bases()
+    if case not in rule_bases:
+        raise ValueError(f"Unknown rule base: {case}")
+    strengths = rule_strengths(rule_bases[case], first_antec, second_antec)
+    return {label: np.fmin(strength, conseq_mf[label])
+            for label, strength in strengths.items()}
+
+@metrics.timed('aggregation')
+def aggregate(active_conseq):
+    """
+    Aggregates the activated output membership functions together, the
+    aggregated result is the union (max) of all of them
+    """
+    return functools.reduce(np.fmax, active_conseq.values())
+
+@metrics.timed('defuzzification')
+def defuzzify(universe, aggregated):
+    """
+    Calculates the crisp output of the aggregated fuzzy set with the centroid
+    method
+    """
+    import skfuzzy as fuzz
+
+    return fuzz.defuzz(universe, aggregated, "centroid")
+
+class FuzzySystem:
+    """
+    Sampled universes and membership functions of the controller, built from
+    the plain definitions (see fuzzy_traffic.definitions).
+    dtype selects the representation of the membership functions, which are
+    most of the memory of the system and of the batch engine:
+    float64     the reference
+    float32     half the memory, the universes are float32 as well
+    uint16      fixed-point memberships (0 to 65535), float32 universes
+    uint8       fixed-point memberships (0 to 255), float32 universes
+    The crisp outputs of the batch engine stay within the bounds measured by
+    precision.output_error of the float64 ones. The memberships of the
+    integer types are in units of membership_scale(dtype).
+    If previous is given, every universe, membership function set and
+    compiled rule base with the same definition as in previous is taken
+    over from it, only the changed ones are built (see config.py).
+    """
+
+    def __init__(self, universe_specs=None, membership_params=None,
+                 rule_bases=None, dtype=np.float64, previous=None):
+        self.universe_specs = universe_specs or definitions.universe_specs
+        self.membership_params = (membership_params
+                                  or definitions.membership_params)
+        self.rule_bases = rule_bases or definitions.rule_bases
+        self.dtype = np.dtype(dtype)
+        # Arrays and compiled rules of previous (an older FuzzySystem) whose
+        # definitions did not change are shared instead of being rebuilt
+        if previous is not None and previous.dtype != self.dtype:
+            previous = None
+
+        if rule_bases is None and membership_params is None:
+            self.rules = default_rule_bases()
+        else:
+            self.rules = {}
+            for case, table in self.rule_bases.items():
+                names = table['antecedents'] + [table['consequent']]
+                if previous is not None and case in previous.rules and (
+                        previous.rule_bases.get(case) == table
+                        and all(list(previous.membership_params[name])
+                                == list(self.membership_params[name])
+                                for name in names)):
+                    self.rules[case] = previous.rules[case]
+                else:
+                    self.rules[case] = RuleBase(table, self.membership_params)
+
+        # Names of the universes and of the membership function sets taken
+        # over from previous, 'urgency' and 'extension_time' name both
+        reused_universes, reused_mfs = set(), set()
+        for name, spec in self.universe_specs.items():
+            if previous is not None and (
+                    tuple(previous.universe_specs.get(name, ()))
+                    == tuple(spec)):
+                universe = getattr(previous, f"{name}_range")
+                reused_universes.add(name)
+            else:
+                universe = np.arange(*spec)
+                if self.dtype != np.float64:
+                    universe = universe.astype(np.float32)
+            setattr(self, f"{name}_range", universe)
+
+        # Generate fuzzy membership functions
+        for name, universe in definitions.membership_universes.items():
+            params = self.membership_params[name]
+            setattr(self, f"{name}_params", params)
+            if (universe in reused_universes
+                    and previous.membership_params.get(name) == params):
+                setattr(self, f"{name}_mf", getattr(previous, f"{name}_mf"))
+                reused_mfs.add(name)
+                continue
+            # Sampled in float64 first, so every representation has the same
+            # breakpoints
+            dict_mf = generate_memberships(
+                np.arange(*self.universe_specs[universe]), params)
+            if self.dtype != np.float64:
+                dict_mf = quantize_memberships(dict_mf, self.dtype)
+            setattr(self, f"{name}_mf", dict_mf)
+
+        for name in ('urgency', 'extension_time'):
+            singletons = f"{name}_singletons"
+            if name in reused_mfs and singletons in vars(previous):
+                setattr(self, singletons, getattr(previous, singletons))
+
+    @functools.cached_property
+    def urgency_singletons(self):
+        """
+        Singleton positions of the urgency sets for the weighted average mode
+        """
+        from .batch import consequent_singletons
+
+        return consequent_singletons(self.urgency_range, self.urgency_mf)
+
+    @functools.cached_property
+    def extension_time_singletons(self):
+        """
+        Singleton positions of the extension time sets for the weighted
+        average mode
+        """
+        from .batch import consequent_singletons
+
+        return consequent_singletons(self.extension_time_range,
+                                     self.extension_time_mf)
+
+@functools.lru_cache(maxsize=None)
+def default_system():
+    """
+    The FuzzySystem of the default definitions, built on first use
+    """
+    return FuzzySystem()
+
+def urgency(q_cars, w, system=None):
+    """
+    Calculates the defuzzified urgency of a direction from the sum of its
+    waiting cars and their waiting time, both clamped to their universes
+    """
+    if system is None:
+        system = default_system()
+    sum_queue = interpret_memberships(
+        system.sum_queue_range, system.sum_queue_mf,
+        clamp_input(system.sum_queue_range, q_cars))
+    wait_t = interpret_memberships(
+        system.waiting_time_range, system.waiting_time_mf,
+        clamp_input(system.waiting_time_range, w))
+    active = rule_activation(sum_queue, wait_t, system.urgency_mf, 'urgency',
+                             system.rules)
+    return defuzzify(system.urgency_range, aggregate(active))
+
+def extension(inner, outer, system=None):
+    """
+    Calculates the defuzzified green phase extension time from the inner and
+    outer lane queues, both clamped to their universe
+    """
+    if system is None:
+        system = default_system()
+    inner_queue = interpret_memberships(
+        system.lane_queue_range, system.inner_lane_queue_mf,
+        clamp_input(system.lane_queue_range, inner))
+    outer_queue = interpret_memberships(
+        system.lane_queue_range, system.outer_lane_queue_mf,
+        clamp_input(system.lane_queue_range, outer))
+    active = rule_activation(inner_queue, outer_queue,
+                             system.extension_time_mf, 'extension',
+                             system.rules)
+    return defuzzify(system.extension_time_range, aggregate(active))
+
+def decision(lane_queues, waiting_times, system=None):
+    """
+    Makes the green phase decision of one intersection. lane_queues maps each
+    direction to its {'inner': ..., 'outer': ...} queues, waiting_times maps
+    each direction to the time since its last green phase.
+    Returns the urgency of each direction, the direction getting the green
+    light and its green phase extension time.
+    """
+    urgencies = {direction: urgency(sum(lane_queues[direction].values()),
+                                    waiting_times[direction], system)
+                 for direction in definitions.directions}
+    # The first direction wins a tie
+    winner = max(urgencies, key=urgencies.get)
+    recorder = metrics.active()
+    if recorder is not None:
+        recorder.chose(winner)
+    return urgencies, winner, extension(lane_queues[winner]['inner'],
+                                        lane_queues[winner]['outer'], system)
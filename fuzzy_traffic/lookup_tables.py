@@ -0,0 +1,142 @@
+import os
+
+import numpy as np
+
+from .batch import batch_extension, batch_urgency
+from .inference import default_system
+
+def compile_surface(engine, x_axis, y_axis, chunk_size=16):
+    """
+    Samples the control surface engine(x, y) on the grid x_axis × y_axis.
+    engine must accept arrays of crisp inputs (e.g. batch_urgency), the grid is
+    evaluated chunk_size rows at a time to bound the memory of the aggregation
+    """
+    values = np.empty((len(x_axis), len(y_axis)))
+    for start in range(0, len(x_axis), chunk_size):
+        xx, yy = np.meshgrid(x_axis[start:start + chunk_size], y_axis,
+                             indexing='ij')
+        values[start:start + chunk_size] = engine(xx, yy)
+    return values
+
+class LookupSurface:
+    """
+    Precomputed control surface over a uniform grid, answers with bilinear
+    interpolation in constant time per query. Inputs outside of the grid are
+    clamped to its edges.
+    """
+
+    def __init__(self, x_axis, y_axis, values):
+        self.x_axis = x_axis
+        self.y_axis = y_axis
+        self.values = values
+        self._x0, self._dx = float(x_axis[0]), float(x_axis[1] - x_axis[0])
+        self._y0, self._dy = float(y_axis[0]), float(y_axis[1] - y_axis[0])
+
+    def _cell(self, crisp, origin, step, n):
+        # Index of the lower grid point and the position inside the cell
+        pos = np.clip((np.asarray(crisp, dtype=float) - origin) / step,
+                      0, n - 1)
+        index = np.minimum(pos.astype(np.intp), n - 2)
+        return index, pos - index
+
+    def __call__(self, x, y):
+        i, tx = self._cell(x, self._x0, self._dx, len(self.x_axis))
+        j, ty = self._cell(y, self._y0, self._dy, len(self.y_axis))
+        v = self.values
+        return ((1 - tx) * ((1 - ty) * v[i, j] + ty * v[i, j + 1])
+                + tx * ((1 - ty) * v[i + 1, j] + ty * v[i + 1, j + 1]))
+
+def max_surface_error(surface, engine, samples=4):
+    """
+    Estimates the largest difference between the lookup surface and the
+    exact engine on a check grid samples times denser than the surface along
+    each axis. The control surfaces have kinks inside the cells, so the
+    largest error is not at a known point of a cell (e.g. its center). The
+    estimate is a lower bound of the true maximum, it approaches it as
+    samples grows.
+    """
+    def check_axis(axis):
+        offsets = np.arange(samples) / samples
+        points = (axis[:-1, np.newaxis]
+                  + offsets * np.diff(axis)[:, np.newaxis]).ravel()
+        return np.append(points, axis[-1])
+
+    x_check, y_check = check_axis(surface.x_axis), check_axis(surface.y_axis)
+    exact = compile_surface(engine, x_check, y_check)
+    xx, yy = np.meshgrid(x_check, y_check, indexing='ij')
+    return float(np.max(np.abs(surface(xx, yy) - exact)))
+
+def save_surface(directory, name, surface):
+    """
+    Saves the grid and the values of the surface as .npy files, so that they
+    can be memory-mapped by load_surface
+    """
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, f"{name}_x.npy"), surface.x_axis)
+    np.save(os.path.join(directory, f"{name}_y.npy"), surface.y_axis)
+    np.save(os.path.join(directory, f"{name}.npy"), surface.values)
+
+def load_surface(directory, name, mmap_mode='r'):
+    """
+    Loads a surface saved by save_surface, the values are memory-mapped
+    instead of read into memory by default
+    """
+    return LookupSurface(
+        np.load(os.path.join(directory, f"{name}_x.npy")),
+        np.load(os.path.join(directory, f"{name}_y.npy")),
+        np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+
+def compile_lookup_tables(directory, queue_step=0.25, waiting_step=1.0,
+                          lane_step=0.25, system=None, check_samples=4):
+    """
+    Samples the urgency (sum of cars × waiting time) and the extension (inner
+    × outer lane queue) control surfaces with the given grid steps and saves
+    them to directory. Whole car counts and seconds lie on the default grids,
+    so for those the tables are exact.
+    Returns the maximum error of each table against the exact engine,
+    estimated by max_surface_error with check_samples (a lower bound, None
+    skips the estimate).
+    """
+    if system is None:
+        system = default_system()
+    queue_axis = np.arange(system.sum_queue_range[0],
+                           system.sum_queue_range[-1], queue_step)
+    waiting_axis = np.arange(system.waiting_time_range[0],
+                             system.waiting_time_range[-1], waiting_step)
+    lane_axis = np.arange(system.lane_queue_range[0],
+                          system.lane_queue_range[-1], lane_step)
+    engines = {
+        'urgency': (lambda x, y: batch_urgency(x, y, system),
+                    queue_axis, waiting_axis),
+        'extension': (lambda x, y: batch_extension(x, y, system),
+                      lane_axis, lane_axis),
+    }
+    errors = {}
+    for name, (engine, x_axis, y_axis) in engines.items():
+        surface = LookupSurface(x_axis, y_axis,
+                                compile_surface(engine, x_axis, y_axis))
+        save_surface(directory, name, surface)
+        if check_samples is not None:
+            errors[name] = max_surface_error(surface, engine, check_samples)
+    return errors
+
+def load_lookup_tables(directory):
+    """
+    Memory-maps the control surfaces saved by compile_lookup_tables
+    """
+    return {name: load_surface(directory, name)
+            for name in ('urgency', 'extension')}
+
+def lookup_decisions(tables, inner_queues, outer_queues, waiting_times):
+    """
+    Same as batch_decisions, but the urgencies and extension times are
+    interpolated from the tables of load_lookup_tables
+    """
+    inner_queues = np.asarray(inner_queues, dtype=float)
+    outer_queues = np.asarray(outer_queues, dtype=float)
+    urgencies = tables['urgency'](inner_queues + outer_queues, waiting_times)
+    winners = np.argmax(urgencies, axis=1)
+    rows = np.arange(len(winners))
+    extensions = tables['extension'](inner_queues[rows, winners],
+                                     outer_queues[rows, winners])
+    return urgencies, winners, extensions
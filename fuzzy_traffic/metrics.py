@@ -0,0 +1,174 @@
+"""
+Optional instrumentation of the inference hot path. Disabled by default, then
+every instrumented function only pays one global lookup and a None check.
+
+    recorder = metrics.enable()
+    ... make decisions ...
+    print(recorder.prometheus())
+
+Stages are timed by the functions decorated with timed(): fuzzification,
+rule_activation, aggregation and defuzzification, in both the scalar and the
+batch engines. Rule firings are counted per rule of each rule base (a rule
+fires if its strength is above zero) and the green phase decisions per
+direction. The recorder is not locked, use one per thread or process.
+"""
+import bisect
+import functools
+import json
+import time
+
+import numpy as np
+
+# Upper bounds of the latency histogram buckets in seconds
+latency_buckets = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+_recorder = None
+
+class Recorder:
+    """
+    Stage timers and counters, rule firing histograms and direction counts
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.firings = {}
+        self.evaluations = {}
+        self.directions = {}
+
+    def time(self, stage, seconds):
+        """
+        Records one call of stage that took seconds
+        """
+        timer = self.stages.get(stage)
+        if timer is None:
+            timer = self.stages[stage] = {
+                'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'buckets': [0] * (len(latency_buckets) + 1)}
+        timer['count'] += 1
+        timer['seconds'] += seconds
+        timer['max_seconds'] = max(timer['max_seconds'], seconds)
+        timer['buckets'][bisect.bisect_left(latency_buckets, seconds)] += 1
+
+    def fired(self, rule_base, firing):
+        """
+        Counts the rules of rule_base firing in firing, the rule firing
+        strengths with the rules on the last axis (see rules.rule_firing)
+        """
+        name = rule_base.consequent
+        counts = self.firings.get(name)
+        if counts is None:
+            counts = self.firings[name] = np.zeros(len(rule_base.rows),
+                                                   dtype=np.int64)
+            self.evaluations[name] = 0
+        firing = np.asarray(firing)
+        fired = (firing > 0).reshape(-1, firing.shape[-1])
+        counts += fired.sum(axis=0)
+        self.evaluations[name] += fired.shape[0]
+
+    def chose(self, directions, counts=None):
+        """
+        Counts green phase decisions, either one direction or a sequence of
+        directions with the number of times each was chosen
+        """
+        if counts is None:
+            directions, counts = (directions,), (1,)
+        for direction, count in zip(directions, counts):
+            self.directions[direction] = (self.directions.get(direction, 0)
+                                          + int(count))
+
+    def reset(self):
+        """
+        Drops everything recorded so far
+        """
+        self.__init__()
+
+    def snapshot(self):
+        """
+        Everything recorded so far as plain data
+        """
+        return {
+            'stages': {stage: dict(timer, buckets=list(timer['buckets']))
+                       for stage, timer in self.stages.items()},
+            'rule_firings': {name: counts.tolist()
+                             for name, counts in self.firings.items()},
+            'rule_evaluations': dict(self.evaluations),
+            'directions': dict(self.directions),
+        }
+
+    def json(self, **kwargs):
+        """
+        The snapshot as a JSON string, kwargs are passed to json.dumps
+        """
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def prometheus(self, prefix='fuzzy_traffic'):
+        """
+        The snapshot in the Prometheus text exposition format
+        """
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, timer in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(latency_buckets + ('+Inf',),
+                                    timer['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",'
+                             f'le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} '
+                         f'{timer["seconds"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} '
+                         f'{timer["count"]}')
+        lines.append(f"# TYPE {prefix}_rule_firings_total counter")
+        for name, counts in self.firings.items():
+            for rule, count in enumerate(counts):
+                lines.append(f'{prefix}_rule_firings_total{{rule_base="{name}",'
+                             f'rule="{rule}"}} {count}')
+        lines.append(f"# TYPE {prefix}_rule_evaluations_total counter")
+        for name, count in self.evaluations.items():
+            lines.append(f'{prefix}_rule_evaluations_total{{rule_base="{name}"}}'
+                         f' {count}')
+        lines.append(f"# TYPE {prefix}_decisions_total counter")
+        for direction, count in self.directions.items():
+            lines.append(f'{prefix}_decisions_total{{direction="{direction}"}} '
+                         f'{count}')
+        return "\n".join(lines) + "\n"
+
+def enable(recorder=None):
+    """
+    Starts recording into recorder (a new Recorder by default) and returns it
+    """
+    global _recorder
+    _recorder = recorder if recorder is not None else Recorder()
+    return _recorder
+
+def disable():
+    """
+    Stops recording, returns the recorder that was active
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+def active():
+    """
+    The active Recorder, None if instrumentation is disabled
+    """
+    return _recorder
+
+def timed(stage):
+    """
+    Decorator recording the run time of every call of the function as stage
+    while a recorder is active
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.time(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
@@ -0,0 +1,232 @@
+"""
+Visualization of the membership functions and of the inference steps. This
+module imports matplotlib, so it is only imported when plots are requested.
+
+Every plot function draws into new figures by default. If axes are given
+(e.g. the axes of a figure drawn before), they are cleared and reused, which
+is much cheaper than creating the figure again, see rendering.py. The tight
+layout of a reused figure does not change, so it can be skipped with
+layout=False.
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+
+from .inference import interpret_memberships
+
+# Colors for the membership functions
+colors = {
+    'zero': 'c',
+    'negligible': 'c',
+    'few': 'g',
+    'short': 'g',
+    'low': 'g',
+    'medium': 'orange',
+    'many': 'r',
+    'long': 'r',
+    'high': 'r',
+}
+
+def _figure(axes, nrows, figsize):
+    """
+    Returns the figure and the axes to draw on, new ones if axes is None,
+    otherwise the given axes cleared
+    """
+    if axes is None:
+        return plt.subplots(nrows=nrows, figsize=figsize)
+    for ax in np.atleast_1d(axes):
+        ax.clear()
+    return np.atleast_1d(axes)[0].figure, axes
+
+def plot_memberships(system, axes=None, layout=True):
+    """
+    Creates plots for the membership functions of every input and output
+    """
+    fig_m, axes = _figure(axes, 6, (10, 8))
+
+    ranges = [system.sum_queue_range, system.waiting_time_range,
+              system.urgency_range, system.lane_queue_range,
+              system.lane_queue_range, system.extension_time_range]
+    membership_functions = [system.sum_queue_mf, system.waiting_time_mf,
+                            system.urgency_mf, system.inner_lane_queue_mf,
+                            system.outer_lane_queue_mf,
+                            system.extension_time_mf]
+    titles = ['INPUT: Várakozó autók összmennyisége',
+              'INPUT: Várakozási idő',
+              'OUTPUT: Várakozási időből adódó prioritásszint',
+              'INPUT: Várakozó autók száma a belső sávban',
+              'INPUT: Várakozó autók száma a külső sávban',
+              'OUTPUT: Zöld lámpa idejéhez adott idő']
+    xticks = [[0, 1, 6, 12, 18, 20],
+              np.arange(0, 151, 30),
+              np.arange(0, 11, 2),
+              np.arange(0, 11, 2),
+              np.arange(0, 11, 2),
+              [0, 1, 10, 20, 30, 40]]
+
+    # Visualize the membership functions
+    for mf, u_range, ax, title, xtick in zip(
+            membership_functions, ranges, axes, titles, xticks):
+        for key, value in mf.items():
+            ax.plot(u_range, value, colors[key], linewidth=2, label=f'{key}')
+        ax.set_xticks(xtick)
+        ax.set_title(title)
+        # Cut off the redundant end of the plot
+        ax.set_xlim([0, u_range[-1]-0.99])
+
+    # Place the legends to the right of the plots
+    for ax in axes:
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+
+    if layout:
+        fig_m.tight_layout()
+    return fig_m
+
+def plot_urgencies(system, urgencies, axes=None, layout=True):
+    """
+    Visualizes the activated urgency fuzzy sets of the four directions before
+    aggregation
+    """
+    # Lower boundary
+    urgency0 = np.zeros_like(system.urgency_range)
+    f_u, axes = _figure(axes, 4, (10, 8))
+
+    titles = ["Észak - sürgősség", "Kelet - sürgősség", "Dél - sürgősség",
+              "Nyugat - sürgősség"]
+
+    # Visualization before aggregation
+    for (urgency, ax, title) in zip(urgencies, axes, titles):
+        for key, value_urgency in urgency.items():
+            ax.fill_between(system.urgency_range, urgency0, value_urgency,
+                            color=colors[key], alpha=0.7)
+        # Draw the outlines of the membership functions
+        for key, value in system.urgency_mf.items():
+            ax.plot(system.urgency_range, value, linewidth=1.5,
+                    color=colors[key], label=f'{key}')
+            # Cut off the redundant end of the plot
+            ax.set_xlim([0, system.urgency_range[-1]-0.99])
+        ax.set_title(title)
+
+    # Place the legends to the right of the plots
+    for ax in axes:
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    if layout:
+        f_u.tight_layout()
+    return f_u
+
+def plot_defuzzified_urgencies(system, aggregated_urgencies, defuzz_results,
+                               axes=None, layout=True):
+    """
+    Visualizes the aggregated urgency of the four directions and their crisp
+    defuzzified value
+    """
+    urgency0 = np.zeros_like(system.urgency_range)
+    fig_d, axes_d = _figure(axes, 4, (10, 8))
+
+    titles = ["Észak - sürgősség (defuzzfikált)",
+              "Kelet - sürgősség (defuzzfikált)",
+              "Dél - sürgősség (defuzzfikált)",
+              "Nyugat - sürgősség (defuzzfikált)"]
+
+    # Visualization of the defuzzified results
+    for (key, value), ax, title in zip(aggregated_urgencies.items(), axes_d,
+                                       titles):
+        # This is only necessary for the plot
+        defuzz_plt = interpret_memberships(
+            system.urgency_range, {key: value}, defuzz_results[key])[key]
+        # Draw the filled aggregated output
+        ax.fill_between(system.urgency_range, urgency0, value,
+                        facecolor='peachpuff', alpha=0.7)
+        ax.plot(system.urgency_range, value, linewidth=1.5, color='k')
+        # Draw a vertical line to mark the crisp output
+        ax.plot([defuzz_results[key], defuzz_results[key]], [0, defuzz_plt],
+                'k', linewidth=1.5, alpha=0.9)
+
+        # Draw the outlines of the membership functions
+        for label, mf in system.urgency_mf.items():
+            ax.plot(system.urgency_range, mf, linewidth=1.5,
+                    color=colors[label], label=f'{label}', linestyle='dashed',
+                    alpha=0.5)
+            # Cut off the redundant end of the plot
+            ax.set_xlim([0, system.urgency_range[-1]-0.99])
+        ax.set_title(title)
+
+    # Place the legends to the right of the plots
+    for ax in axes_d:
+        ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    if layout:
+        fig_d.tight_layout()
+    return fig_d
+
+def plot_extension(system, extension, axes=None, layout=True):
+    """
+    Visualizes the activated green phase extension fuzzy sets before
+    aggregation
+    """
+    # Lower boundary
+    extension0 = np.zeros_like(system.extension_time_range)
+    f_ext, ax_ext = _figure(axes, 1, (8, 4))
+    title = 'Zöld lámpa fázis meghosszabbításának ideje'
+
+    # Visualization before aggregation
+    for key, value in extension.items():
+        ax_ext.fill_between(system.extension_time_range, extension0, value,
+                            color=colors[key], alpha=0.7)
+    # Draw the outlines of the membership functions
+    for key, value in system.extension_time_mf.items():
+        ax_ext.plot(system.extension_time_range, value, linewidth=1.5,
+                    color=colors[key], label=f'{key}')
+        # Cut off the redundant end of the plot
+        ax_ext.set_xlim([0, system.extension_time_range[-1]-0.99])
+    ax_ext.set_title(title)
+    # Place the legends to the right of the plots
+    ax_ext.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    if layout:
+        f_ext.tight_layout()
+    return f_ext
+
+def plot_defuzzified_extension(system, aggregated_extension,
+                               defuzz_ext_result, axes=None, layout=True):
+    """
+    Visualizes the aggregated green phase extension and its crisp
+    defuzzified value
+    """
+    extension0 = np.zeros_like(system.extension_time_range)
+    fig_d, ax_ext_def = _figure(axes, 1, (8, 4))
+    title = 'Zöld lámpa fázis meghosszabbításának ideje (defuzzifikált)'
+
+    # This is only necessary for the plot
+    defuzz_ext_plt = interpret_memberships(
+        system.extension_time_range, {'aggregated': aggregated_extension},
+        defuzz_ext_result)['aggregated']
+
+    # Visualization of the defuzzified result
+    # Draw the filled aggregated output
+    ax_ext_def.fill_between(system.extension_time_range, extension0,
+                            aggregated_extension, facecolor='peachpuff',
+                            alpha=0.7)
+    ax_ext_def.plot(system.extension_time_range, aggregated_extension,
+                    linewidth=1.5, color='k')
+    # Draw a vertical line to mark the crisp output
+    ax_ext_def.plot([defuzz_ext_result, defuzz_ext_result],
+                    [0, defuzz_ext_plt], 'k', linewidth=1.5, alpha=0.9)
+
+    # Draw the outlines of the membership functions
+    for key, value in system.extension_time_mf.items():
+        ax_ext_def.plot(system.extension_time_range, value, linewidth=1.5,
+                        color=colors[key], label=f'{key}', linestyle='dashed',
+                        alpha=0.5)
+        # Cut off the redundant end of the plot
+        ax_ext_def.set_xlim([0, system.extension_time_range[-1]-0.99])
+    ax_ext_def.set_title(title)
+
+    # Place the legends to the right of the plots
+    ax_ext_def.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    if layout:
+        fig_d.tight_layout()
+    return fig_d
+
+def show():
+    """
+    Shows every created figure, blocks until they are closed
+    """
+    plt.show()
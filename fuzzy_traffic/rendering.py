@@ -0,0 +1,176 @@
+"""
+Headless rendering of the diagnostic figures of single decisions to image
+files, e.g. to keep an explanation of audited decisions. The figures are
+plain matplotlib Figures saved with the non-interactive Agg canvas, they are
+not managed by pyplot, so nothing is shown and no display is needed.
+A DecisionRenderer creates its figures once and reuses them for every
+decision, batches are rendered in a pool of processes so that the control
+loop does not wait for them:
+
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        futures = submit_decisions(pool, audited, 'audit/')
+        ... keep controlling ...
+"""
+import os
+
+from matplotlib.figure import Figure
+
+from .definitions import directions
+from .inference import (aggregate, clamp_input, default_system, defuzzify,
+                        interpret_memberships, rule_activation)
+
+# The figures of a decision and the plotting function drawing each of them
+figure_specs = {
+    'urgencies': ('plot_urgencies', 4, (10, 8)),
+    'defuzzified_urgencies': ('plot_defuzzified_urgencies', 4, (10, 8)),
+    'extension': ('plot_extension', 1, (8, 4)),
+    'defuzzified_extension': ('plot_defuzzified_extension', 1, (8, 4)),
+}
+
+def explain(lane_queues, waiting_times, system=None):
+    """
+    Makes the green phase decision of one intersection like
+    inference.decision, but also returns the intermediate fuzzy sets drawn by
+    the plotting functions
+    """
+    if system is None:
+        system = default_system()
+    urgencies, aggregated_urgencies, defuzz_results = [], {}, {}
+    for direction in directions:
+        sum_queue = interpret_memberships(
+            system.sum_queue_range, system.sum_queue_mf,
+            clamp_input(system.sum_queue_range,
+                        sum(lane_queues[direction].values())))
+        wait_t = interpret_memberships(
+            system.waiting_time_range, system.waiting_time_mf,
+            clamp_input(system.waiting_time_range, waiting_times[direction]))
+        active = rule_activation(sum_queue, wait_t, system.urgency_mf,
+                                 'urgency', system.rules)
+        urgencies.append(active)
+        aggregated_urgencies[direction] = aggregate(active)
+        defuzz_results[direction] = defuzzify(
+            system.urgency_range, aggregated_urgencies[direction])
+    # The first direction wins a tie
+    winner = max(directions, key=defuzz_results.get)
+
+    inner_queue = interpret_memberships(
+        system.lane_queue_range, system.inner_lane_queue_mf,
+        clamp_input(system.lane_queue_range, lane_queues[winner]['inner']))
+    outer_queue = interpret_memberships(
+        system.lane_queue_range, system.outer_lane_queue_mf,
+        clamp_input(system.lane_queue_range, lane_queues[winner]['outer']))
+    extension = rule_activation(inner_queue, outer_queue,
+                                system.extension_time_mf, 'extension',
+                                system.rules)
+    aggregated_extension = aggregate(extension)
+    return {
+        'urgencies': urgencies,
+        'aggregated_urgencies': aggregated_urgencies,
+        'defuzz_results': defuzz_results,
+        'winner': winner,
+        'extension': extension,
+        'aggregated_extension': aggregated_extension,
+        'defuzz_ext_result': defuzzify(system.extension_time_range,
+                                       aggregated_extension),
+    }
+
+class DecisionRenderer:
+    """
+    Draws the urgency and extension figures of decisions and saves them to
+    files. The figures and their axes are created and laid out once, they
+    are cleared and redrawn for each decision.
+    """
+
+    def __init__(self, system=None, dpi=100, file_format='png'):
+        # Imported here, so pyplot is not needed just to import this module
+        from . import plotting
+
+        self.plotting = plotting
+        self.system = system or default_system()
+        self.dpi = dpi
+        self.file_format = file_format
+        self.figures = {}
+        self.axes = {}
+        self.drawn = False
+        for name, (_, nrows, figsize) in figure_specs.items():
+            figure = Figure(figsize=figsize)
+            self.figures[name] = figure
+            self.axes[name] = figure.subplots(nrows=nrows)
+
+    def draw(self, explanation):
+        """
+        Draws the figures of an explanation (see explain), returns them by
+        name
+        """
+        arguments = {
+            'urgencies': (explanation['urgencies'],),
+            'defuzzified_urgencies': (explanation['aggregated_urgencies'],
+                                      explanation['defuzz_results']),
+            'extension': (explanation['extension'],),
+            'defuzzified_extension': (explanation['aggregated_extension'],
+                                      explanation['defuzz_ext_result']),
+        }
+        for name, (function, _, _) in figure_specs.items():
+            # The layout is the same for every decision, only the first
+            # drawing computes it
+            getattr(self.plotting, function)(
+                self.system, *arguments[name], axes=self.axes[name],
+                layout=not self.drawn)
+        self.drawn = True
+        return self.figures
+
+    def render(self, lane_queues, waiting_times, directory, prefix):
+        """
+        Explains the decision of the inputs and saves its figures to
+        directory as <prefix>_<figure>.<format>, returns the paths
+        """
+        self.draw(explain(lane_queues, waiting_times, self.system))
+        paths = []
+        for name, figure in self.figures.items():
+            path = os.path.join(directory,
+                                f"{prefix}_{name}.{self.file_format}")
+            figure.savefig(path, dpi=self.dpi)
+            paths.append(path)
+        return paths
+
+def render_chunk(decisions, directory, system=None, **kwargs):
+    """
+    Renders (prefix, lane_queues, waiting_times) decisions with one renderer,
+    returns the saved paths. kwargs are passed to DecisionRenderer.
+    """
+    os.makedirs(directory, exist_ok=True)
+    renderer = DecisionRenderer(system, **kwargs)
+    paths = []
+    for prefix, lane_queues, waiting_times in decisions:
+        paths.extend(renderer.render(lane_queues, waiting_times, directory,
+                                     prefix))
+    return paths
+
+def submit_decisions(executor, decisions, directory, chunk_size=16,
+                     system=None, **kwargs):
+    """
+    Submits the rendering of (prefix, lane_queues, waiting_times) decisions
+    to executor (e.g. a ProcessPoolExecutor) in chunks of chunk_size, each
+    chunk reuses one renderer. Returns the futures of the chunks, their
+    results are the saved paths.
+    """
+    decisions = list(decisions)
+    return [executor.submit(render_chunk, decisions[start:start + chunk_size],
+                            directory, system, **kwargs)
+            for start in range(0, len(decisions), chunk_size)]
+
+def render_decisions(decisions, directory, processes=None, chunk_size=16,
+                     system=None, **kwargs):
+    """
+    Renders (prefix, lane_queues, waiting_times) decisions in a pool of
+    processes (os.cpu_count() by default, 0 renders in this process) and
+    waits for them. Returns the saved paths in the order of the decisions.
+    """
+    import concurrent.futures
+
+    if processes == 0:
+        return render_chunk(decisions, directory, system, **kwargs)
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        futures = submit_decisions(pool, decisions, directory, chunk_size,
+                                   system, **kwargs)
+        return [path for future in futures for path in future.result()]
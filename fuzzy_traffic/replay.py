@@ -0,0 +1,211 @@
+"""
+Offline replay of recorded detector logs through the batch engine.
+
+A log is a directory of .npy arrays with one row per recorded decision:
+    inner.npy, outer.npy    (n, 4) inner and outer lane queues
+    waiting.npy             (n, 4) seconds since the last green phase
+    time.npy                (n,) timestamps, optional
+in the direction order north, east, south, west. The arrays are memory-mapped
+and replayed chunk by chunk, so a log never has to fit in memory.
+convert_log creates a log from an .npz file or from a CSV file with the
+columns <direction>_inner, <direction>_outer, <direction>_waiting (and
+optionally time):
+
+    python -m fuzzy_traffic.replay LOG [--convert SOURCE] [--output DIRECTORY]
+"""
+import argparse
+import concurrent.futures
+import itertools
+import os
+import time
+
+import numpy as np
+
+from .batch import batch_decisions, defuzzification_methods
+from .definitions import directions
+from .inference import default_system
+
+log_columns = ('inner', 'outer', 'waiting')
+
+def _csv_columns():
+    """
+    CSV column names of each log array
+    """
+    return {name: [f"{direction}_{name}" for direction in directions]
+            for name in log_columns}
+
+def convert_log(source, directory, chunk_size=65536):
+    """
+    Converts an .npz file (arrays named like the log files) or a CSV file
+    with a header row into a log directory. CSV files are read chunk_size
+    rows at a time straight into the memory-mapped arrays.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if source.endswith('.npz'):
+        with np.load(source) as arrays:
+            for name in log_columns + ('time',):
+                if name in arrays:
+                    np.save(os.path.join(directory, f"{name}.npy"),
+                            arrays[name])
+        return
+
+    with open(source) as f:
+        header = f.readline().strip().split(',')
+        rows = sum(1 for line in f if line.strip())
+    index = {column: i for i, column in enumerate(header)}
+    columns = {name: [index[column] for column in csv_names]
+               for name, csv_names in _csv_columns().items()}
+    if 'time' in index:
+        columns['time'] = index['time']
+    outputs = {name: np.lib.format.open_memmap(
+                   os.path.join(directory, f"{name}.npy"), mode='w+',
+                   dtype=np.float64,
+                   shape=(rows,) if name == 'time' else (rows, 4))
+               for name in columns}
+
+    with open(source) as f:
+        f.readline()
+        lines = (line for line in f if line.strip())
+        start = 0
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                break
+            values = np.loadtxt(chunk, delimiter=',', ndmin=2)
+            for name, column in columns.items():
+                outputs[name][start:start + len(chunk)] = values[:, column]
+            start += len(chunk)
+    for output in outputs.values():
+        output.flush()
+
+def load_log(directory):
+    """
+    Memory-maps the arrays of a log directory
+    """
+    log = {}
+    for name in log_columns + ('time',):
+        path = os.path.join(directory, f"{name}.npy")
+        if os.path.exists(path):
+            log[name] = np.load(path, mmap_mode='r')
+    return log
+
+def replay(log, chunk_size=65536, system=None, decide=batch_decisions,
+           **kwargs):
+    """
+    Replays a log (see load_log) chunk_size rows at a time and yields the
+    (start row, urgencies, winners, extensions) of each chunk. Queues and
+    waiting times beyond the universes are clamped to their ends like in the
+    simulation. kwargs are passed to decide (e.g. urgency_method).
+    """
+    if system is None:
+        system = default_system()
+    max_lane = system.lane_queue_range[-1]
+    max_wait = system.waiting_time_range[-1]
+    for start in range(0, len(log['inner']), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        urgencies, winners, extensions = decide(
+            np.minimum(log['inner'][chunk], max_lane),
+            np.minimum(log['outer'][chunk], max_lane),
+            np.minimum(log['waiting'][chunk], max_wait), system=system,
+            **kwargs)
+        yield start, urgencies, winners, extensions
+
+# Decision arrays written by replay_log
+output_specs = (
+    ('urgencies', np.float32, 4),
+    ('winners', np.uint8, None),
+    ('extensions', np.float32, None),
+)
+
+def _replay_rows(directory, output, start, stop, chunk_size, system, kwargs):
+    """
+    Replays rows start to stop of the log in directory and writes the
+    decisions into the arrays already created in output (may be None)
+    """
+    log = {name: array[start:stop]
+           for name, array in load_log(directory).items()}
+    outputs = None
+    if output is not None:
+        outputs = [np.load(os.path.join(output, f"{name}.npy"),
+                           mmap_mode='r+')
+                   for name, _, _ in output_specs]
+    for offset, *results in replay(log, chunk_size, system, **kwargs):
+        if outputs is not None:
+            for array, result in zip(outputs, results):
+                array[start + offset:start + offset + len(result)] = result
+    if outputs is not None:
+        for array in outputs:
+            array.flush()
+    return stop - start
+
+def replay_log(directory, output=None, chunk_size=65536, processes=0,
+               system=None, **kwargs):
+    """
+    Replays the log in directory. If output is a directory, the decisions are
+    written there as memory-mapped urgencies.npy (float32), winners.npy
+    (uint8 direction indices) and extensions.npy (float32) while replaying.
+    With processes other than 0, the chunks are replayed in a pool of that
+    many processes (None means os.cpu_count()), each maps the files itself.
+    Returns the number of rows, the wall time and the rows per second.
+    """
+    rows = len(load_log(directory)['inner'])
+    if output is not None:
+        os.makedirs(output, exist_ok=True)
+        for name, dtype, width in output_specs:
+            np.lib.format.open_memmap(
+                os.path.join(output, f"{name}.npy"), mode='w+', dtype=dtype,
+                shape=(rows, width) if width else (rows,)).flush()
+
+    start_time = time.perf_counter()
+    if processes == 0:
+        _replay_rows(directory, output, 0, rows, chunk_size, system, kwargs)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                processes or os.cpu_count()) as pool:
+            futures = [pool.submit(_replay_rows, directory, output, start,
+                                   min(start + chunk_size, rows), chunk_size,
+                                   system, kwargs)
+                       for start in range(0, rows, chunk_size)]
+            for future in futures:
+                future.result()
+    wall = time.perf_counter() - start_time
+    return {
+        'rows': rows,
+        'wall_seconds': wall,
+        'rows_per_second': rows / wall if wall else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic.replay',
+        description='Replay a recorded detector log through the controller')
+    parser.add_argument('log', help='log directory')
+    parser.add_argument('--convert', metavar='SOURCE',
+                        help='first convert SOURCE (.npz or .csv) into the '
+                             'log directory')
+    parser.add_argument('--output', metavar='DIRECTORY',
+                        help='write the decisions to DIRECTORY')
+    parser.add_argument('--chunk-size', type=int, default=65536,
+                        help='rows per batch (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='replay processes, 0 replays in this process '
+                             '(default: %(default)s)')
+    parser.add_argument('--urgency-method', choices=defuzzification_methods,
+                        default='centroid',
+                        help='urgency defuzzification (default: %(default)s)')
+    parser.add_argument('--extension-method',
+                        choices=defuzzification_methods, default='centroid',
+                        help='extension defuzzification '
+                             '(default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.convert:
+        convert_log(args.convert, args.log, args.chunk_size)
+    results = replay_log(args.log, args.output, args.chunk_size,
+                         args.processes, urgency_method=args.urgency_method,
+                         extension_method=args.extension_method)
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+if __name__ == '__main__':
+    main()
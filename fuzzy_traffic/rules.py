@@ -0,0 +1,103 @@
+import functools
+
+import numpy as np
+
+from . import definitions, metrics
+
+class RuleBase:
+    """
+    A rule table (see definitions.rule_bases) compiled into index arrays.
+    rule_index[i, j] is the position of the label of the j-th antecedent of
+    the i-th rule in the label order of that antecedent. The rules are also
+    kept sorted by consequent, so that the firing strength of each consequent
+    is a single grouped max-reduce.
+    """
+
+    def __init__(self, table, membership_params=None):
+        if membership_params is None:
+            membership_params = definitions.membership_params
+        self.antecedents = list(table['antecedents'])
+        self.consequent = table['consequent']
+        self.antecedent_labels = [list(membership_params[name])
+                                  for name in self.antecedents]
+        self.consequent_labels = list(membership_params[self.consequent])
+        self.rows = [tuple(row) for row in table['rules']]
+
+        n_inputs = len(self.antecedents)
+        for row in self.rows:
+            if len(row) != n_inputs + 1:
+                raise ValueError(f"Rule {row} of {self.consequent} needs "
+                                 f"{n_inputs} antecedents and a consequent")
+        try:
+            self.rule_index = np.array(
+                [[labels.index(label)
+                  for labels, label in zip(self.antecedent_labels, row)]
+                 for row in self.rows], dtype=np.intp).reshape(-1, n_inputs)
+            self.consequent_index = np.array(
+                [self.consequent_labels.index(row[-1]) for row in self.rows],
+                dtype=np.intp)
+        except ValueError:
+            raise ValueError(f"Unknown label in the rules of "
+                             f"{self.consequent}") from None
+
+        # Rules of each combination of antecedent labels, for evaluating only
+        # the rules of the active labels
+        self.rule_lookup = {}
+        for i, row in enumerate(self.rows):
+            self.rule_lookup.setdefault(row[:-1], []).append(i)
+
+        # Rules sorted by consequent and the first rule of each group
+        self.order = np.argsort(self.consequent_index, kind='stable')
+        sorted_index = self.consequent_index[self.order]
+        self.group_starts = np.flatnonzero(
+            np.r_[True, sorted_index[1:] != sorted_index[:-1]])
+        self.group_labels = [self.consequent_labels[k]
+                             for k in sorted_index[self.group_starts]]
+
+def rule_firing(rule_base, *antecedents):
+    """
+    Calculates the firing strength (AND = min) of every rule, antecedents are
+    dicts of membership values (floats or arrays of the same shape) in the
+    order of rule_base.antecedents. The rules are the last axis of the result.
+    """
+    firing = None
+    for j, (antec, labels) in enumerate(
+            zip(antecedents, rule_base.antecedent_labels)):
+        values = np.stack([np.asarray(antec[label])
+                           for label in labels], axis=-1)
+        gathered = values[..., rule_base.rule_index[:, j]]
+        firing = gathered if firing is None else np.fmin(firing, gathered)
+    return firing
+
+def consequent_strengths(rule_base, firing):
+    """
+    Calculates the firing strength of each consequent fuzzy set from the rule
+    firing strengths (OR = max). Consequents without any rule get zero.
+    """
+    grouped = np.maximum.reduceat(firing[..., rule_base.order],
+                                  rule_base.group_starts, axis=-1)
+    strengths = {label: np.zeros(firing.shape[:-1], dtype=firing.dtype)
+                 for label in rule_base.consequent_labels}
+    for k, label in enumerate(rule_base.group_labels):
+        strengths[label] = grouped[..., k]
+    return strengths
+
+def rule_strengths(rule_base, *antecedents):
+    """
+    Firing strength of each consequent fuzzy set for the antecedent membership
+    values. Clipping the consequent by the strongest of its rules is the same
+    as clipping it by every rule and taking their union.
+    """
+    firing = rule_firing(rule_base, *antecedents)
+    recorder = metrics.active()
+    if recorder is not None:
+        recorder.fired(rule_base, firing)
+    return consequent_strengths(rule_base, firing)
+
+@functools.lru_cache(maxsize=None)
+def default_rule_bases():
+    """
+    The compiled rule bases of the default definitions
+    """
+    return {case: RuleBase(table)
+            for case, table in definitions.rule_bases.items()}
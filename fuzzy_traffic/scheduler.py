@@ -0,0 +1,175 @@
+"""
+Deadline-aware green phase decisions with a fixed-time fallback.
+
+A DecisionScheduler runs every decision of the controller in a worker thread
+and waits for it at most until the deadline of the cycle. If the decision is
+late, the inputs are invalid (a missing direction, a negative or non-finite
+value) or the controller raises, the next step of a fixed-time plan computed
+beforehand is used instead, so the caller always gets a decision within the
+deadline (plus at most one interpreter thread switch interval, see
+sys.getswitchinterval, as the worker holds the GIL while it computes):
+
+    scheduler = DecisionScheduler(deadline=0.005)
+    result = scheduler.decide(lane_queues, waiting_times)
+    if result.fallback is not None:
+        ... the fixed-time plan was used, result.fallback says why ...
+
+A late decision is not interrupted, its result is dropped when it finishes.
+While it still runs, the following cycles fall back at once ('busy'). The
+latency of every cycle goes into a histogram with the buckets of
+metrics.latency_buckets, see stats().
+"""
+import bisect
+import collections
+import concurrent.futures
+import math
+import time
+
+from . import metrics
+from .definitions import directions
+from .inference import decision, default_system, extension
+
+ScheduledDecision = collections.namedtuple(
+    'ScheduledDecision',
+    ['direction', 'extension', 'urgencies', 'fallback', 'seconds'])
+
+# Reasons of a fallback decision
+fallback_reasons = ('deadline', 'busy', 'invalid', 'error')
+
+def validate_inputs(lane_queues, waiting_times):
+    """
+    Raises a ValueError if a direction is missing from the inputs or one of
+    its queues or its waiting time is negative or not a finite number
+    """
+    for direction in directions:
+        values = [waiting_times[direction]]
+        values += [lane_queues[direction][lane] for lane in ('inner', 'outer')]
+        for value in values:
+            if not math.isfinite(value) or value < 0:
+                raise ValueError(f"Invalid input of {direction}: {value}")
+
+def fixed_time_plan(system=None, extension_time=None):
+    """
+    Fixed-time plan serving the directions in turn, each with the same
+    extension: extension_time, or the extension of the controller for two
+    half full lanes by default. Returns (direction, extension) steps.
+    """
+    if system is None:
+        system = default_system()
+    if extension_time is None:
+        half = system.lane_queue_range[-1] / 2
+        extension_time = float(extension(half, half, system))
+    return [(direction, extension_time) for direction in directions]
+
+class DecisionScheduler:
+    """
+    Makes the decisions of one intersection with decide (inference.decision
+    by default, any function with its arguments and results) within deadline
+    seconds, falling back to the fixed-time plan (see fixed_time_plan) when
+    it cannot. The fallback continues the plan after the direction that got
+    the last green phase, whoever chose it, so no direction is starved.
+    """
+
+    def __init__(self, deadline, system=None, decide=decision, plan=None):
+        self.deadline = deadline
+        self.system = system or default_system()
+        self.decide_function = decide
+        self.plan = plan or fixed_time_plan(self.system)
+        self.last_direction = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='decision')
+        self._running = None
+        self.decisions = 0
+        self.fallbacks = dict.fromkeys(fallback_reasons, 0)
+        self.last_error = None
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(metrics.latency_buckets) + 1)
+
+    def _fallback(self):
+        """
+        Next step of the fixed-time plan
+        """
+        served = [direction for direction, _ in self.plan]
+        if self.last_direction in served:
+            step = (served.index(self.last_direction) + 1) % len(self.plan)
+        else:
+            step = 0
+        return self.plan[step]
+
+    def decide(self, lane_queues, waiting_times):
+        """
+        Makes the green phase decision of the inputs (see
+        inference.decision). Returns a ScheduledDecision, its fallback is
+        None if the controller decided in time, otherwise one of
+        fallback_reasons and the urgencies are None.
+        """
+        start = time.perf_counter()
+        fallback = None
+        try:
+            validate_inputs(lane_queues, waiting_times)
+        except (KeyError, TypeError, ValueError) as error:
+            fallback, self.last_error = 'invalid', error
+        if fallback is None and self._running is not None:
+            if self._running.done():
+                self._running = None
+            else:
+                fallback = 'busy'
+        if fallback is None:
+            future = self._executor.submit(
+                self.decide_function, lane_queues, waiting_times, self.system)
+            remaining = self.deadline - (time.perf_counter() - start)
+            try:
+                urgencies, direction, extension_time = future.result(
+                    max(remaining, 0.0))
+            except concurrent.futures.TimeoutError:
+                self._running = future
+                fallback = 'deadline'
+            except Exception as error:
+                fallback, self.last_error = 'error', error
+
+        if fallback is None:
+            result = (direction, float(extension_time), urgencies)
+        else:
+            self.fallbacks[fallback] += 1
+            result = tuple(self._fallback()) + (None,)
+        self.last_direction = result[0]
+        seconds = time.perf_counter() - start
+        self._record(seconds)
+        return ScheduledDecision(*result, fallback, seconds)
+
+    def _record(self, seconds):
+        self.decisions += 1
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(metrics.latency_buckets,
+                                        seconds)] += 1
+        recorder = metrics.active()
+        if recorder is not None:
+            recorder.time('scheduled_decision', seconds)
+
+    def stats(self):
+        """
+        Number of decisions, of the fallbacks by reason (deadline misses are
+        'deadline' and 'busy'), the slowest cycle and the latency histogram
+        as (upper bound in seconds, count) buckets, the last bound is None
+        """
+        return {
+            'decisions': self.decisions,
+            'fallbacks': dict(self.fallbacks),
+            'deadline_misses': (self.fallbacks['deadline']
+                                + self.fallbacks['busy']),
+            'max_seconds': self.max_seconds,
+            'latency_histogram': list(zip(metrics.latency_buckets + (None,),
+                                          self.buckets)),
+        }
+
+    def close(self):
+        """
+        Stops the worker thread without waiting for a late decision
+        """
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
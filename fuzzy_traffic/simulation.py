@@ -0,0 +1,126 @@
+"""
+Discrete-time simulation of many independent intersections driven by the
+controller, for load testing and for looking at the behaviour over time.
+
+Each second cars arrive at every lane (Poisson), the lanes of the green
+direction are served (Poisson, at most the queue) and the waiting time clocks
+of the red directions tick. When the green phase of an intersection ends, the
+next green direction and its extension are chosen by batch_decisions for all
+intersections that are due. The intersections are split into shards that run
+in a process pool.
+"""
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+from .batch import batch_decisions
+from .inference import default_system
+
+def simulate_shard(n_intersections, duration, arrival_rate=0.05,
+                   service_rate=0.5, green_time=10.0, seed=None,
+                   decide=None):
+    """
+    Simulates n_intersections intersections for duration seconds.
+    arrival_rate and service_rate are cars per second per lane, they can also
+    be arrays broadcasting to (n_intersections, 4, 2) (directions × inner and
+    outer lanes). decide defaults to batch_decisions.
+    Returns the traffic totals of the shard, see run_simulation.
+    """
+    if decide is None:
+        decide = batch_decisions
+    system = default_system()
+    max_lane = system.lane_queue_range[-1]
+    max_wait = system.waiting_time_range[-1]
+
+    rng = np.random.default_rng(seed)
+    shape = (n_intersections, 4, 2)
+    arrival_rate = np.broadcast_to(arrival_rate, shape)
+    service_rate = np.broadcast_to(service_rate, shape)
+    queues = np.zeros(shape, dtype=np.int64)
+    waiting = np.zeros((n_intersections, 4))
+    green = np.zeros(n_intersections, dtype=np.intp)
+    # Every intersection makes its first decision in the first second
+    phase_end = np.zeros(n_intersections)
+    rows = np.arange(n_intersections)
+
+    delay = 0.0
+    departed = 0
+    max_queue = 0
+    decisions = 0
+    for t in range(int(duration)):
+        due = np.flatnonzero(phase_end <= t)
+        if len(due):
+            # Queues and waiting times beyond the universes are clamped
+            clamped = np.minimum(queues[due], max_lane)
+            _, winners, extensions = decide(
+                clamped[:, :, 0], clamped[:, :, 1],
+                np.minimum(waiting[due], max_wait))
+            green[due] = winners
+            phase_end[due] = t + green_time + extensions
+            decisions += len(due)
+
+        queues += rng.poisson(arrival_rate)
+        served = np.minimum(queues[rows, green],
+                            rng.poisson(service_rate[rows, green]))
+        queues[rows, green] -= served
+        departed += int(served.sum())
+
+        # Every waiting car waits one more second
+        delay += float(queues.sum())
+        max_queue = max(max_queue, int(queues.sum(axis=2).max()))
+        waiting += 1.0
+        waiting[rows, green] = 0.0
+
+    return {
+        'intersections': n_intersections,
+        'delay': delay,
+        'departed': departed,
+        'waiting_cars': int(queues.sum()),
+        'max_queue': max_queue,
+        'decisions': decisions,
+    }
+
+def run_simulation(n_intersections, duration, processes=None,
+                   shard_size=256, seed=0, **kwargs):
+    """
+    Simulates n_intersections independent intersections for duration
+    seconds, sharded over a pool of processes (os.cpu_count() by default,
+    0 runs in this process). kwargs are passed to simulate_shard.
+    Returns the traffic KPIs and the throughput:
+    mean_delay        car-seconds waited per served car
+    max_queue         longest queue of a direction over all intersections
+    sim_seconds_per_wall_second, intersection_seconds_per_wall_second
+    """
+    sizes = [min(shard_size, n_intersections - start)
+             for start in range(0, n_intersections, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    start = time.perf_counter()
+    if processes == 0:
+        shards = [simulate_shard(size, duration, seed=shard_seed, **kwargs)
+                  for size, shard_seed in zip(sizes, seeds)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                processes or os.cpu_count()) as pool:
+            futures = [pool.submit(simulate_shard, size, duration,
+                                   seed=shard_seed, **kwargs)
+                       for size, shard_seed in zip(sizes, seeds)]
+            shards = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    delay = sum(shard['delay'] for shard in shards)
+    departed = sum(shard['departed'] for shard in shards)
+    return {
+        'intersections': n_intersections,
+        'duration': duration,
+        'wall_seconds': wall,
+        'sim_seconds_per_wall_second': duration / wall,
+        'intersection_seconds_per_wall_second':
+            n_intersections * duration / wall,
+        'mean_delay': delay / departed if departed else 0.0,
+        'max_queue': max(shard['max_queue'] for shard in shards),
+        'departed': departed,
+        'waiting_cars': sum(shard['waiting_cars'] for shard in shards),
+        'decisions': sum(shard['decisions'] for shard in shards),
+    }
@@ -0,0 +1,153 @@
+"""
+Streaming controller driven by detector events instead of a single snapshot.
+
+Events are (time, kind, direction, lane) tuples, kind is one of:
+    'arrival'    a car joined the queue of the lane of the direction
+    'departure'  a car left the queue of the lane of the direction
+    'phase'      the signal switched to green for the direction by itself
+                 (e.g. a manual override), lane is not used
+    'tick'       only advances the clock, direction and lane are not used
+Events must come in time order. A phase decision is due when the current green
+phase (green_time plus the extension) ends. It is made with the queues and
+waiting times at that moment.
+"""
+import collections
+
+from . import metrics
+from .definitions import directions
+from .inference import clamp_input, default_system
+from .sparse import sparse_extension, sparse_urgency
+
+Event = collections.namedtuple('Event', ['time', 'kind', 'direction', 'lane'],
+                               defaults=(None, None))
+Decision = collections.namedtuple('Decision',
+                                  ['time', 'direction', 'extension',
+                                   'urgencies'])
+
+class StreamingController:
+    """
+    Keeps the queues and the waiting time clocks of the four directions and
+    makes a phase decision whenever one is due. The urgency of a direction is
+    only recomputed if its inputs (sum of waiting cars, waiting time in whole
+    seconds) changed since it was last evaluated.
+    """
+
+    def __init__(self, green_time=30.0, start_time=0.0, system=None,
+                 urgency=sparse_urgency, extension=sparse_extension):
+        self.green_time = green_time
+        self.system = system or default_system()
+        self.urgency = urgency
+        self.extension = extension
+        self.now = start_time
+        self.lane_queues = {direction: {'inner': 0, 'outer': 0}
+                            for direction in directions}
+        # The waiting time clock of a direction starts when its green ends
+        self.last_green = {direction: start_time for direction in directions}
+        self.green = None
+        self.green_until = start_time
+        self.urgencies = {}
+        self._urgency_inputs = {}
+        self._urgency_system = self.system
+        self.evaluations = 0
+        self.skipped = 0
+
+    def waiting_time(self, direction, now, system=None):
+        """
+        Whole seconds since the last green phase of direction, limited to the
+        waiting time universe of system (the current one by default)
+        """
+        if system is None:
+            system = self.system
+        waited = int(max(now - self.last_green[direction], 0))
+        return int(clamp_input(system.waiting_time_range, waited))
+
+    def _update_urgencies(self, now, system):
+        if system is not self._urgency_system:
+            # The system was replaced (e.g. by a ReloadableSystem), every
+            # urgency has to be evaluated again
+            self._urgency_inputs = {}
+            self._urgency_system = system
+        for direction in directions:
+            # Clamped like the engines do, so that the queues beyond the
+            # universe do not change the inputs
+            inputs = (float(clamp_input(system.sum_queue_range,
+                                        sum(self.lane_queues[direction]
+                                            .values()))),
+                      self.waiting_time(direction, now, system))
+            if self._urgency_inputs.get(direction) == inputs:
+                self.skipped += 1
+                continue
+            self.urgencies[direction] = self.urgency(*inputs, system)
+            self._urgency_inputs[direction] = inputs
+            self.evaluations += 1
+
+    def _decide(self, now):
+        # The whole decision is made with the system it started with
+        system = self.system
+        self._update_urgencies(now, system)
+        # The first direction wins a tie
+        winner = max(directions, key=self.urgencies.get)
+        queues = self.lane_queues[winner]
+        extension = float(self.extension(queues['inner'], queues['outer'],
+                                         system))
+        self.green = winner
+        self.green_until = now + self.green_time + extension
+        self.last_green[winner] = self.green_until
+        recorder = metrics.active()
+        if recorder is not None:
+            recorder.chose(winner)
+        return Decision(now, winner, extension, dict(self.urgencies))
+
+    def advance(self, now):
+        """
+        Moves the clock to now and returns the decisions that became due
+        """
+        decisions = []
+        while self.green_until <= now:
+            decisions.append(self._decide(self.green_until))
+        self.now = now
+        return decisions
+
+    def handle(self, event):
+        """
+        Applies a detector event and returns the decisions that became due
+        up to its time
+        """
+        event = Event(*event)
+        decisions = self.advance(event.time)
+        if event.kind == 'arrival':
+            self.lane_queues[event.direction][event.lane] += 1
+        elif event.kind == 'departure':
+            queues = self.lane_queues[event.direction]
+            queues[event.lane] = max(queues[event.lane] - 1, 0)
+        elif event.kind == 'phase':
+            self.green = event.direction
+            self.green_until = event.time + self.green_time
+            self.last_green[event.direction] = self.green_until
+        elif event.kind != 'tick':
+            raise ValueError(f"Unknown event kind: {event.kind}")
+        return decisions
+
+    def run(self, events):
+        """
+        Consumes an iterable of events and yields the phase decisions as they
+        become due
+        """
+        for event in events:
+            yield from self.handle(event)
+
+    async def run_async(self, events):
+        """
+        Same as run for an asynchronous iterable of events, e.g. an
+        asyncio.Queue drained by an async generator
+        """
+        async for event in events:
+            for decision in self.handle(event):
+                yield decision
+
+    def stats(self):
+        """
+        Number of urgency evaluations and of the ones skipped because the
+        inputs of the direction did not change
+        """
+        return {'evaluations': self.evaluations, 'skipped': self.skipped}
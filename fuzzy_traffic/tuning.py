@@ -0,0 +1,248 @@
+"""
+Auto-tuning of the membership function breakpoints against simulated
+traffic. Every breakpoint of the tuned membership function sets is a
+parameter, a candidate is scored by the mean delay of the simulation (see
+simulation.simulate_shard) driven by its controller. The search is a simple
+evolution strategy: the best candidates of each generation are kept and
+mutated, the candidates of a generation are evaluated in a process pool.
+
+A candidate is simulated with its control surfaces sampled at every whole
+car count and second. The simulation only produces whole inputs, so the
+lookup is exact, except that inputs beyond a universe are clamped to its last
+whole value instead of its last sample (for the default definitions the mean
+delay differs by 0.1% from the exact simulation). Each worker caches the
+surfaces by the breakpoints they depend on: a child mutates one membership
+function set, so it shares one of its two surfaces with its parent.
+
+    python -m fuzzy_traffic.tuning [--generations N] [--population N]
+                                   [--output CONFIG.json]
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import copy
+import json
+import os
+import time
+
+import numpy as np
+
+from . import definitions
+from .batch import batch_extension, batch_urgency
+from .cache import LRUCache
+from .inference import FuzzySystem
+from .lookup_tables import LookupSurface, compile_surface, lookup_decisions
+from .simulation import simulate_shard
+
+# Membership function sets feeding each control surface
+surface_inputs = {
+    'urgency': ('sum_queue', 'waiting_time', 'urgency'),
+    'extension': ('inner_lane_queue', 'outer_lane_queue', 'extension_time'),
+}
+
+_surface_cache = LRUCache(max_entries=64)
+
+def parameter_vector(membership_params, names):
+    """
+    Flattens the breakpoints of the membership function sets names
+    """
+    return np.array([point for name in names
+                     for params in membership_params[name].values()
+                     for point in params], dtype=float)
+
+def vector_params(vector, names, template=None, universe_specs=None):
+    """
+    Inverse of parameter_vector: membership_params with the breakpoints of
+    names taken from vector. The breakpoints of every membership function are
+    sorted and clipped to its universe, so every vector is a valid candidate.
+    """
+    template = template or definitions.membership_params
+    universe_specs = universe_specs or definitions.universe_specs
+    membership_params = copy.deepcopy(template)
+    i = 0
+    for name in names:
+        start, stop, _ = universe_specs[definitions.membership_universes[name]]
+        for label, params in template[name].items():
+            points = np.clip(np.sort(vector[i:i + len(params)]), start, stop)
+            membership_params[name][label] = [float(p) for p in points]
+            i += len(params)
+    return membership_params
+
+def _surface(case, membership_params):
+    """
+    Control surface of case sampled at every whole input, cached by the
+    breakpoints it depends on
+    """
+    key = (case,) + tuple(
+        tuple(tuple(params) for params in membership_params[name].values())
+        for name in surface_inputs[case])
+
+    def compute():
+        system = FuzzySystem(membership_params=membership_params)
+        if case == 'urgency':
+            x_axis = np.arange(0.0, system.sum_queue_range[-1])
+            y_axis = np.arange(0.0, system.waiting_time_range[-1])
+            engine = lambda x, y: batch_urgency(x, y, system)
+        else:
+            x_axis = y_axis = np.arange(0.0, system.lane_queue_range[-1])
+            engine = lambda x, y: batch_extension(x, y, system)
+        return LookupSurface(x_axis, y_axis,
+                             compile_surface(engine, x_axis, y_axis))
+
+    return _surface_cache.get(key, compute)
+
+def evaluate(membership_params, n_intersections=64, duration=1800, seed=0,
+             **kwargs):
+    """
+    Mean delay (car-seconds per served car) of n_intersections simulated for
+    duration seconds with the controller of membership_params. The same seed
+    gives every candidate the same traffic. kwargs are passed to
+    simulate_shard.
+    Returns the mean delay and the numbers of surface cache hits and misses
+    of this evaluation.
+    """
+    before = _surface_cache.stats()
+    tables = {case: _surface(case, membership_params)
+              for case in surface_inputs}
+    after = _surface_cache.stats()
+    shard = simulate_shard(
+        n_intersections, duration, seed=seed,
+        decide=lambda inner, outer, waiting: lookup_decisions(
+            tables, inner, outer, waiting), **kwargs)
+    delay = shard['delay'] / shard['departed'] if shard['departed'] else 0.0
+    return (delay, after['hits'] - before['hits'],
+            after['misses'] - before['misses'])
+
+def tune(names=tuple(definitions.membership_params), generations=10,
+         population=16, elite=4, sigma=0.05, processes=None, seed=0,
+         **kwargs):
+    """
+    Tunes the breakpoints of the membership function sets names. The first
+    generation is the current definitions and population - 1 random
+    mutations of them. Each following generation keeps the elite best
+    candidates and fills the population with their mutations: the
+    breakpoints of one randomly chosen set get normal noise with a standard
+    deviation of sigma × the width of its universe. kwargs are passed to
+    evaluate (n_intersections, duration, arrival_rate, ...). The candidates
+    are evaluated in a pool of processes (os.cpu_count() by default, 0
+    evaluates them in this process), scores of candidates seen before are
+    reused.
+    Returns the best membership_params, its mean delay, the mean delay of
+    the current definitions, the best mean delay of each generation and the
+    fraction of the surface lookups answered by the caches.
+    """
+    rng = np.random.default_rng(seed)
+    template = definitions.membership_params
+    # Index range and noise scale of the breakpoints of each set
+    slices, scales = [], np.empty(0)
+    for name in names:
+        start, stop, _ = definitions.universe_specs[
+            definitions.membership_universes[name]]
+        size = len(parameter_vector(template, [name]))
+        slices.append(slice(len(scales), len(scales) + size))
+        scales = np.concatenate([scales,
+                                 np.full(size, sigma * (stop - start))])
+
+    def mutate(vector):
+        child = vector.copy()
+        part = slices[rng.integers(len(slices))]
+        child[part] += rng.normal(0.0, scales[part])
+        # Through vector_params, so every candidate is stored normalized
+        return parameter_vector(vector_params(child, names), names)
+
+    scores = {}
+    lookups = {'hits': 0, 'misses': 0}
+
+    def score_all(candidates, pool):
+        new = {tuple(v): v for v in candidates if tuple(v) not in scores}
+        if pool is None:
+            results = {key: evaluate(vector_params(v, names), **kwargs)
+                       for key, v in new.items()}
+        else:
+            futures = {key: pool.submit(evaluate, vector_params(v, names),
+                                        **kwargs)
+                       for key, v in new.items()}
+            results = {key: future.result()
+                       for key, future in futures.items()}
+        for key, (score, hits, misses) in results.items():
+            scores[key] = score
+            lookups['hits'] += hits
+            lookups['misses'] += misses
+        return sorted(candidates, key=lambda v: scores[tuple(v)])
+
+    start_time = time.perf_counter()
+    baseline = parameter_vector(template, names)
+    if processes == 0:
+        executor = contextlib.nullcontext()
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            processes or os.cpu_count())
+    with executor as pool:
+        ranked = score_all(
+            [baseline] + [mutate(baseline) for _ in range(population - 1)],
+            pool)
+        history = [scores[tuple(ranked[0])]]
+        for _ in range(generations - 1):
+            parents = ranked[:elite]
+            children = [mutate(parents[rng.integers(len(parents))])
+                        for _ in range(population - elite)]
+            ranked = score_all(parents + children, pool)
+            history.append(scores[tuple(ranked[0])])
+
+    return {
+        'membership_params': vector_params(ranked[0], names),
+        'mean_delay': scores[tuple(ranked[0])],
+        'baseline_delay': scores[tuple(baseline)],
+        'history': history,
+        'evaluations': len(scores),
+        'surface_cache_hit_rate': (lookups['hits']
+                                   / max(lookups['hits'] + lookups['misses'],
+                                         1)),
+        'wall_seconds': time.perf_counter() - start_time,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m fuzzy_traffic.tuning',
+        description='Tune the membership functions against simulated traffic')
+    parser.add_argument('--sets', nargs='+',
+                        choices=list(definitions.membership_params),
+                        default=list(definitions.membership_params),
+                        help='membership function sets to tune (default: all)')
+    parser.add_argument('--generations', type=int, default=10,
+                        help='(default: %(default)s)')
+    parser.add_argument('--population', type=int, default=16,
+                        help='(default: %(default)s)')
+    parser.add_argument('--elite', type=int, default=4,
+                        help='candidates kept per generation '
+                             '(default: %(default)s)')
+    parser.add_argument('--sigma', type=float, default=0.05,
+                        help='mutation size relative to the universe '
+                             '(default: %(default)s)')
+    parser.add_argument('--intersections', type=int, default=64,
+                        help='simulated intersections per candidate '
+                             '(default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=1800,
+                        help='simulated seconds per candidate '
+                             '(default: %(default)s)')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes, 0 evaluates in this process '
+                             '(default: number of CPUs)')
+    parser.add_argument('--output', metavar='CONFIG.json',
+                        help='save the best membership_params as a '
+                             'configuration file (see config.py)')
+    args = parser.parse_args(argv)
+
+    results = tune(args.sets, args.generations, args.population, args.elite,
+                   args.sigma, args.processes,
+                   n_intersections=args.intersections, duration=args.duration)
+    for key, value in results.items():
+        if key != 'membership_params':
+            print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'membership_params': results['membership_params']}, f,
+                      indent=2)
+
+if __name__ == '__main__':
+    main()